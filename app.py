@@ -1,11 +1,27 @@
-from flask import Flask, render_template, jsonify
+from flask import Flask, Response, g, render_template, request
 import json
+import hashlib
 import os
 import time
 import threading
 import logging
+import socket
+import sys
+import uuid
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from downsample import lttb_indices
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, Gauge, Histogram
 from social_fetcher import SocialMediaFetcher
+from timeseries import (
+    CARRIED_COLUMN, History, METRICS, MISSING, PLATFORMS, TOTAL_COLUMNS, Rollup, carried_platforms, carry_forward,
+    carry_forward_entry,
+    encode_log_records
+)
+from scheduler import RefreshScheduler
+from storage import PreconditionFailed, create_storage
 
 # Load environment variables
 load_dotenv()
@@ -13,9 +29,9 @@ load_dotenv()
 app = Flask(__name__)
 
 # Configure logging for both development and production
-if __name__ != '__main__':
+gunicorn_logger = logging.getLogger('gunicorn.error')
+if gunicorn_logger.handlers:
     # Running under gunicorn
-    gunicorn_logger = logging.getLogger('gunicorn.error')
     app.logger.handlers.clear()  # Clear any existing handlers
     app.logger.handlers = gunicorn_logger.handlers
     app.logger.setLevel(gunicorn_logger.level)
@@ -28,13 +44,47 @@ if __name__ != '__main__':
     root_logger.setLevel(gunicorn_logger.level)
     
 else:
-    # Running in development mode
+    # Running in development mode or as the refresh worker
     logging.basicConfig(level=logging.INFO)
     app.logger.setLevel(logging.INFO)
 
 # Configuration
-DATA_FILE = os.environ.get('DATA_FILE', 'engagement_data.json')
-REFRESH_INTERVAL = int(os.environ.get('REFRESH_INTERVAL', 4 * 60 * 60))  # Default 4 hours in seconds
+DATA_FILE = os.environ.get('DATA_FILE', 'engagement_data.json')  # Legacy JSON history, migrated on first load
+HISTORY_FILE = os.environ.get('HISTORY_FILE', os.path.splitext(DATA_FILE)[0] + '.fgts')
+HISTORY_LOG_FILE = os.environ.get('HISTORY_LOG_FILE', HISTORY_FILE + '.log')
+COMPACT_AFTER = int(os.environ.get('COMPACT_AFTER', 500))  # Log records before the base file is rewritten
+REFRESH_LEASE_FILE = os.environ.get('REFRESH_LEASE_FILE', HISTORY_FILE + '.lease')
+REFRESH_LEASE_TTL = int(os.environ.get('REFRESH_LEASE_TTL', 15 * 60))  # Seconds before a crashed refresher's lease can be taken over
+REFRESH_INTERVAL = int(os.environ.get('REFRESH_INTERVAL', 4 * 60 * 60))  # Default 4 hours in seconds; used for pairs without a growth estimate yet
+REFRESH_MIN_INTERVAL = int(os.environ.get('REFRESH_MIN_INTERVAL', 30 * 60))  # Fastest a single video/platform pair is polled
+REFRESH_MAX_INTERVAL = int(os.environ.get('REFRESH_MAX_INTERVAL', 24 * 60 * 60))  # Slowest, for pairs that stopped growing
+REFRESH_CHANGE_TARGET = float(os.environ.get('REFRESH_CHANGE_TARGET', 0.01))  # Poll a pair again once it is expected to grow by this fraction
+REFRESH_SCHEDULE_FILE = os.environ.get('REFRESH_SCHEDULE_FILE', HISTORY_FILE + '.schedule')
+EMBEDDED_REFRESH = os.environ.get('EMBEDDED_REFRESH', '').lower() in ('1', 'true', 'yes')  # Refresh from a thread of the web process instead of refresh_worker.py
+MAX_SERIALIZED = 32  # Response bodies cached per snapshot; every distinct trends query takes one
+
+EVENT_KEEPALIVE = int(os.environ.get('EVENT_KEEPALIVE', 25))  # Seconds between keepalive comments on idle event streams
+MAX_EVENT_STREAMS = int(os.environ.get('MAX_EVENT_STREAMS', 48))  # Open /api/events streams per worker, below its thread count
+
+TREND_METRICS = ['combined', 'views', 'likes', 'comments']
+DASHBOARD_SECTIONS = ['videos', 'players', 'trends']
+ROLLUP_TIERS = {'daily': 24 * 60 * 60, 'hourly': 60 * 60}  # Bucket widths in seconds, coarsest first
+
+# Exported on /metrics
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', "Time to answer a request, until the body starts for streams",
+    ['endpoint', 'method', 'status']
+)
+REFRESH_DURATION = Histogram(
+    'refresh_duration_seconds', "Time of a refresh that fetched something, from loading the history to saving it",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800)
+)
+HISTORY_READ_DURATION = Histogram('history_read_duration_seconds', "Time to read the base file and replay the log")
+HISTORY_SAVE_DURATION = Histogram('history_save_duration_seconds', "Time to save a refresh's points, compaction included")
+SNAPSHOT_BUILD_DURATION = Histogram('snapshot_build_duration_seconds', "Time to build the scores and trends served to requests")
+HISTORY_BYTES = Gauge('history_file_bytes', "Size of the stored history as last read or written", ['file'])
+HISTORY_POINTS = Gauge('history_points', "Points in the served history, over all videos")
+EVENT_STREAMS = Gauge('event_streams', "Open /api/events streams of this worker")
 
 # Video and player mappings
 VIDEOS = {
@@ -140,262 +190,981 @@ SOCIAL_URLS = {
     }
 }
 
+def _player_weights(player):
+    """Yield (video_id, weight) pairs for a player"""
+    for video_spec in PLAYER_VIDEOS[player]:
+        if isinstance(video_spec, tuple):
+            yield video_spec
+        else:
+            yield video_spec, 1.0
+
+
+def _point_scores(point):
+    """Totals plus platform-specific data for frontend recalculation, and the platforms carried from earlier points"""
+    scores = {
+        'combined': point['total_views'] + point['total_likes'] + point['total_comments'],
+        'views': point['total_views'],
+        'likes': point['total_likes'],
+        'comments': point['total_comments'],
+    }
+    for platform in PLATFORMS:
+        scores[f'views_{platform}'] = point.get(f'views_{platform}', 0)
+        scores[f'likes_{platform}'] = point.get(f'likes_{platform}', 0)
+        scores[f'comments_{platform}'] = point.get(f'comments_{platform}', 0)
+    if point.get(CARRIED_COLUMN, 0) > 0:
+        scores['carried'] = carried_platforms(point[CARRIED_COLUMN])
+    return scores
+
+
+def build_video_scores(history):
+    scores = {}
+    for video_id, series in history.items():
+        if len(series):
+            scores[video_id] = {
+                'name': VIDEOS[video_id],
+                **_point_scores(series.point(-1))
+            }
+    return scores
+
+
+def _player_totals(player, scores_by_video):
+    """Weighted sum of a player's video scores; videos without a score count as zero"""
+    combined = views = likes = comments = 0
+    
+    for video_id, weight in _player_weights(player):
+        video_score = scores_by_video.get(video_id)
+        if video_score:
+            combined += video_score['combined'] * weight
+            views += video_score['views'] * weight
+            likes += video_score['likes'] * weight
+            comments += video_score['comments'] * weight
+    
+    return {
+        'combined': int(combined),
+        'views': int(views),
+        'likes': int(likes),
+        'comments': int(comments)
+    }
+
+
+def build_player_scores(video_scores):
+    return {
+        player: {'name': player, **_player_totals(player, video_scores)}
+        for player in PLAYER_VIDEOS
+    }
+
+
+def build_trends(history):
+    trends = {'videos': {}, 'players': {}}
+    
+    # Video trends, indexed by timestamp for the player pass below
+    points_by_timestamp = {}
+    for video_id, series in history.items():
+        if len(series):
+            video_points = [{'timestamp': point['timestamp'], **_point_scores(point)} for point in series.points()]
+            trends['videos'][video_id] = {
+                'name': VIDEOS[video_id],
+                'data': video_points
+            }
+            for point in video_points:
+                points_by_timestamp.setdefault(point['timestamp'], {})[video_id] = point
+    
+    # Player trends: one pass over the timestamps. A refresh only adds points for the videos it
+    # fetched, so each timestamp sums the latest point of every video at or before it.
+    for player in PLAYER_VIDEOS:
+        trends['players'][player] = {'name': player, 'data': []}
+    latest = {}
+    for timestamp in sorted(points_by_timestamp):
+        latest.update(points_by_timestamp[timestamp])
+        for player in PLAYER_VIDEOS:
+            trends['players'][player]['data'].append({'timestamp': timestamp, **_player_totals(player, latest)})
+    
+    return trends
+
+
+def build_rollups(history):
+    return {name: Rollup.from_history(history, width) for name, width in ROLLUP_TIERS.items()}
+
+
+def _trend_fields(metrics, platforms):
+    """Fields kept in video trend points; combined needs every platform metric to be recalculated"""
+    platform_metrics = METRICS if 'combined' in metrics else [metric for metric in METRICS if metric in metrics]
+    return ['timestamp', *metrics] + [
+        f'{metric}_{platform}' for platform in platforms for metric in platform_metrics
+    ] + ['carried']
+
+
+def _select_fields(points, fields):
+    # Optional fields such as carried are only present on some points
+    return [{field: point[field] for field in fields if field in point} for point in points]
+
+
+def _as_of_slots(timestamps, indices):
+    """For each of the sorted indices, the last slot at or before it that holds a point, or None"""
+    slots = []
+    last = None
+    position = 0
+    for index in indices:
+        while position <= index:
+            if timestamps[position] != MISSING:
+                last = position
+            position += 1
+        slots.append(last)
+    return slots
+
+
+def _rollup_reference(rollup, start, end):
+    """Summed player combined score in each bucket from start to end, to downsample a rollup by"""
+    video_weights = {}
+    for player in PLAYER_VIDEOS:
+        for video_id, weight in _player_weights(player):
+            video_weights[video_id] = video_weights.get(video_id, 0) + weight
+    
+    reference = [0] * (end - start)
+    for video_id, weight in video_weights.items():
+        series = rollup.series.get(video_id)
+        if series is None:
+            continue
+        columns = [series.columns[name] for name in TOTAL_COLUMNS]
+        for offset, slot in enumerate(_as_of_slots(series.timestamps, range(start, end))):
+            if slot is not None:
+                reference[offset] += weight * sum(column[slot] for column in columns)
+    return reference
+
+
+def build_rollup_trends(rollup, indices):
+    """Trends in the build_trends layout with one point per selected rollup bucket.
+    
+    Every video point in a bucket carries the bucket's timestamp, so players
+    line up with their videos just as they do on the raw axis. Players sum the
+    latest point of each video at or before the bucket, like build_trends.
+    """
+    trends = {'videos': {}, 'players': {}}
+    points_by_bucket = [{} for _ in indices]
+    for video_id, series in rollup.series.items():
+        video_points = []
+        scores, scores_slot = None, None
+        for offset, (index, slot) in enumerate(zip(indices, _as_of_slots(series.timestamps, indices))):
+            if slot is None:
+                continue
+            if slot != scores_slot:
+                scores, scores_slot = _point_scores(series.point(slot)), slot
+            if slot == index:
+                video_points.append({'timestamp': rollup.timestamps[index], **scores})
+            points_by_bucket[offset][video_id] = scores
+        if video_points:
+            trends['videos'][video_id] = {'name': VIDEOS.get(video_id, video_id), 'data': video_points}
+    
+    for player in PLAYER_VIDEOS:
+        trends['players'][player] = {
+            'name': player,
+            'data': [
+                {'timestamp': rollup.timestamps[index], **_player_totals(player, points)}
+                for index, points in zip(indices, points_by_bucket)
+            ]
+        }
+    
+    return trends
+
+
+class TrendSeries:
+    """Trends (in the build_trends layout) indexed for window queries"""
+    
+    def __init__(self, trends):
+        self.trends = trends
+        # Shared timestamp axis of every video, and the summed player scores along it to downsample by
+        player_points = [player['data'] for player in trends['players'].values()]
+        self.timestamps = [point['timestamp'] for point in player_points[0]] if player_points else []
+        self.reference = [sum(point['combined'] for point in points) for points in zip(*player_points)]
+        self.video_timestamps = {
+            video_id: [point['timestamp'] for point in video['data']]
+            for video_id, video in trends['videos'].items()
+        }
+    
+    def count(self, since=None, until=None):
+        return max(0, self._end(until) - self._start(since))
+    
+    def _start(self, since):
+        return bisect_left(self.timestamps, since) if since is not None else 0
+    
+    def _end(self, until):
+        return bisect_right(self.timestamps, until) if until is not None else len(self.timestamps)
+    
+    def window(self, since=None, until=None, max_points=None, metrics=TREND_METRICS, platforms=PLATFORMS):
+        """Trends between since and until (inclusive), downsampled to at most max_points per line.
+        
+        Points are chosen with LTTB on the shared timestamp axis of all videos,
+        so player points and the video points they are summed from stay
+        aligned. Each video keeps its latest point in every bucket between two
+        chosen timestamps.
+        """
+        axis = self.timestamps
+        start, end = self._start(since), self._end(until)
+        downsampled = max_points is not None and end - start > max_points
+        if downsampled:
+            keep = lttb_indices(axis[start:end], self.reference[start:end], max_points)
+            indices = [start + index for index in keep]
+        else:
+            indices = range(start, end)
+        
+        video_fields = _trend_fields(metrics, platforms)
+        player_fields = ['timestamp', *metrics]
+        trends = {'videos': {}, 'players': {}}
+        
+        for video_id, video in self.trends['videos'].items():
+            timestamps = self.video_timestamps[video_id]
+            if downsampled:
+                points = []
+                previous = axis[start] - 1
+                for index in indices:
+                    position = bisect_right(timestamps, axis[index]) - 1
+                    if position >= 0 and timestamps[position] > previous:
+                        points.append(video['data'][position])
+                    previous = axis[index]
+            elif start < end:
+                points = video['data'][bisect_left(timestamps, axis[start]):bisect_right(timestamps, axis[end - 1])]
+            else:
+                points = []
+            if points:
+                trends['videos'][video_id] = {'name': video['name'], 'data': _select_fields(points, video_fields)}
+        
+        for player, player_trend in self.trends['players'].items():
+            points = [player_trend['data'][index] for index in indices]
+            trends['players'][player] = {'name': player, 'data': _select_fields(points, player_fields)}
+        
+        return trends
+
+
+def build_trend_window(snapshot, since=None, until=None, max_points=None, metrics=TREND_METRICS, platforms=PLATFORMS):
+    """Trends for a query, answered from the coarsest rollup tier that still has max_points buckets
+    in the window, or from the raw points when no tier does"""
+    series = snapshot.trend_series
+    if max_points is not None and series.count(since, until) > max_points:
+        for rollup in snapshot.rollups.values():
+            start, end = rollup.index_range(since, until)
+            if end - start >= max_points:
+                # Only the chosen buckets are ever turned into points
+                keep = lttb_indices(rollup.timestamps[start:end], _rollup_reference(rollup, start, end), max_points)
+                trends = build_rollup_trends(rollup, [start + index for index in keep])
+                return TrendSeries(trends).window(metrics=metrics, platforms=platforms)
+    return series.window(since, until, max_points, metrics, platforms)
+
+
+class Snapshot:
+    """Precomputed, read-only view of one version of the engagement data.
+    
+    Request handlers only read from a snapshot; a new one is built whenever the
+    data file changes or a refresh publishes new data.
+    """
+    
+    def __init__(self, history, version, rollups=None):
+        self.version = version
+        # Served values fill failed fetches with the last observed ones
+        history = carry_forward(history)
+        self.video_scores = build_video_scores(history)
+        self.player_scores = build_player_scores(self.video_scores)
+        self.trends = build_trends(history)
+        self.trend_series = TrendSeries(self.trends)
+        self.latest_timestamp = self.trend_series.timestamps[-1] if self.trend_series.timestamps else None
+        # Rollup tiers, coarsest first; owned by this snapshot
+        self.rollups = rollups if rollups is not None else build_rollups(history)
+        
+        self._serialized = {}
+        self._serialized_lock = threading.Lock()
+    
+    def serialized(self, name, build):
+        """Return (body, etag) for the payload returned by build(), serializing it once per snapshot"""
+        cached = self._serialized.get(name)
+        if cached is None:
+            body = json.dumps(build(), separators=(',', ':'), sort_keys=True).encode('utf-8')
+            cached = (body, hashlib.sha256(body).hexdigest()[:32])
+            with self._serialized_lock:
+                if len(self._serialized) >= MAX_SERIALIZED:
+                    # Evict the oldest body; it is rebuilt if requested again
+                    del self._serialized[next(iter(self._serialized))]
+                self._serialized[name] = cached
+        return cached
+
+
+class SnapshotEvents:
+    """Wakes the open event streams whenever a new snapshot is published"""
+    
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.sequence = 0
+        self.streams = 0
+    
+    def notify(self):
+        with self.condition:
+            self.sequence += 1
+            self.condition.notify_all()
+    
+    def wait(self, sequence, timeout):
+        """Block until a snapshot newer than sequence is published or timeout passes; return the current sequence"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence != sequence, timeout)
+            return self.sequence
+    
+    def open_stream(self):
+        with self.condition:
+            if self.streams >= MAX_EVENT_STREAMS:
+                return False
+            self.streams += 1
+            return True
+    
+    def close_stream(self):
+        with self.condition:
+            self.streams -= 1
+
+
 class DataManager:
     def __init__(self):
-        self.data = {}
+        self.history = History(VIDEOS)
+        self.rollups = build_rollups(carry_forward(self.history))  # Kept up to date as refreshes append points
+        self.scheduler = self._new_scheduler()  # Filled by load_data
+        self.pending = []  # (video_id, entry) pairs appended since the last save
+        self.file_header = None  # Header of HISTORY_FILE as last read or written
+        self.base_generation = None  # Storage generation of HISTORY_FILE as last read or written
+        self.log_records = 0  # Records in HISTORY_LOG_FILE since the last compaction
+        self.log_torn = False  # HISTORY_LOG_FILE ends in a partial record, so nothing is appended until a compaction
+        self.stored_signature = False  # _stored_signature() as last read or written; False before the first load
         self.last_update = 0
         self.lock = threading.Lock()
-        self.fetcher = SocialMediaFetcher()
+        self._fetcher = None  # Built on first use, so importing the app opens no sessions, caches or storage clients
+        self._storage = None
+        self._resources_lock = threading.Lock()
+        self.published = (None, None)
+        self.snapshot_lock = threading.Lock()
+        self.reader = None  # What get_snapshot last read, kept to extend with the log; see _read_published
+        self.events = SnapshotEvents()
+        self.owner = self._lease_owner()
+        self.lease_depth = 0
+    
+    @property
+    def fetcher(self):
+        if self._fetcher is None:
+            with self._resources_lock:
+                if self._fetcher is None:
+                    self._fetcher = SocialMediaFetcher()
+        return self._fetcher
+    
+    @property
+    def storage(self):
+        if self._storage is None:
+            with self._resources_lock:
+                if self._storage is None:
+                    self._storage = create_storage()
+                    # Nothing can hold the lock or the lease before storage exists
+                    os.register_at_fork(after_in_child=self._after_fork)
+        return self._storage
+    
+    @staticmethod
+    def _lease_owner():
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    
+    def _after_fork(self):
+        """Workers forked while the parent was refreshing start without its lock and lease, under their own name"""
+        self.lock = threading.Lock()
+        self.owner = self._lease_owner()
+        self.lease_depth = 0
+    
+    def _acquire_lease(self):
+        """Take or renew the refresh lease; False if another process holds it or storage fails"""
+        try:
+            return self.storage.acquire_lease(REFRESH_LEASE_FILE, self.owner, REFRESH_LEASE_TTL)
+        except Exception as e:
+            app.logger.error(f"Error acquiring refresh lease: {e}")
+            return False
+    
+    @contextmanager
+    def refresh_lease(self):
+        """Hold the lease that makes this process the only writer of the history; yields whether it was obtained.
         
-    def load_data(self):
+        Reentrant, so code that writes under the lease can call code that takes it too.
+        """
+        if self.lease_depth == 0 and not self._acquire_lease():
+            yield False
+            return
+        
+        self.lease_depth += 1
         try:
-            if os.path.exists(DATA_FILE):
-                with open(DATA_FILE, 'r') as f:
-                    self.data = json.load(f)
-                    app.logger.info(f"Loaded data from {DATA_FILE}")
+            yield True
+        finally:
+            self.lease_depth -= 1
+            if self.lease_depth == 0:
+                try:
+                    self.storage.release_lease(REFRESH_LEASE_FILE, self.owner)
+                except Exception as e:
+                    app.logger.error(f"Error releasing refresh lease: {e}")
+    
+    def _file_signature(self, max_age=None):
+        """Cheap change detection for the stored base file and log"""
+        signature = (
+            self.storage.signature(HISTORY_FILE, max_age=max_age), self.storage.signature(HISTORY_LOG_FILE, max_age=max_age)
+        )
+        return signature if any(signature) else None
+    
+    def _stored_signature(self):
+        """_file_signature plus the schedule's, both current: a refresher reloads when another one wrote either"""
+        return self._file_signature(max_age=0), self.storage.signature(REFRESH_SCHEDULE_FILE, max_age=0)
+    
+    @HISTORY_READ_DURATION.time()
+    def _read_history(self):
+        """Read the base file and replay the log, migrating the legacy JSON file if that is all there is.
+        
+        Returns (history, base_generation, log_records, torn, log_offset).
+        base_generation is None when the base file does not exist yet and has
+        to be written in full; torn is True when the log ends in a partially
+        written record; log_offset is the length of the log up to its last
+        complete record. Storage errors are raised, never turned into an empty
+        history.
+        """
+        history, base_generation = History(VIDEOS), None
+        stored = self.storage.read(HISTORY_FILE)
+        if stored is not None:
+            raw, base_generation = stored
+            HISTORY_BYTES.set(len(raw), file='base')
+            history = History.decode(raw, VIDEOS)
+            app.logger.info(f"Loaded data from {HISTORY_FILE}")
+        else:
+            HISTORY_BYTES.set(0, file='base')
+            legacy = self.storage.read(DATA_FILE)
+            if legacy is not None:
+                history = History.from_legacy(json.loads(legacy[0]), VIDEOS)
+                app.logger.info(f"Loaded legacy data from {DATA_FILE}")
             else:
-                self.data = {video: [] for video in VIDEOS.keys()}
                 app.logger.info("Initialized empty data structure")
+        
+        log_records, torn, log_offset = 0, False, 0
+        stored_log = self.storage.read(HISTORY_LOG_FILE)
+        HISTORY_BYTES.set(len(stored_log[0]) if stored_log is not None else 0, file='log')
+        if stored_log is not None:
+            log_records, torn = history.replay_log(stored_log[0])
+            log_offset = stored_log[0].rfind(b'\n') + 1
+            if torn:
+                app.logger.warning(f"Ignoring partially written record at the end of {HISTORY_LOG_FILE}")
+        return history, base_generation, log_records, torn, log_offset
+    
+    def load_data(self):
+        """Read the stored history; returns False and keeps the data in memory if it cannot be read"""
+        try:
+            # Taken before reading, so a write that lands in between is picked up by the next reload
+            signature = self._stored_signature()
+            history, base_generation, log_records, torn, _ = self._read_history()
         except Exception as e:
             app.logger.error(f"Error loading data: {e}")
-            self.data = {video: [] for video in VIDEOS.keys()}
+            return False
+        
+        self.stored_signature = signature
+        self.history, self.base_generation, self.log_records = history, base_generation, log_records
+        self.log_torn = torn
+        self.rollups = build_rollups(carry_forward(self.history))
+        self.load_schedule()
+        self.file_header = self.history.file_header if self.base_generation is not None else None
+        self.pending = []
+        if torn or (self.file_header is None and len(self.history)):
+            # Rewriting the base file is left to whichever process holds the lease
+            with self.refresh_lease() as owned:
+                if owned:
+                    self.compact()
+        return True
+    
+    def reload_if_changed(self):
+        """Load the stored history unless it is what this process last read or wrote; False if it cannot be read"""
+        try:
+            if self._stored_signature() == self.stored_signature:
+                return True
+        except Exception as e:
+            app.logger.error(f"Error checking stored data: {e}")
+            return False
+        return self.load_data()
+    
+    @staticmethod
+    def _new_scheduler():
+        return RefreshScheduler(REFRESH_INTERVAL, REFRESH_MIN_INTERVAL, REFRESH_MAX_INTERVAL, REFRESH_CHANGE_TARGET)
+    
+    def _last_fetched(self, video_id, platform):
+        """(timestamp, [views, likes, comments]) of the newest point with a value for the pair, or (None, None)"""
+        series = self.history.get(video_id)
+        views = series.columns.get(f'views_{platform}')
+        if views is None:
+            return None, None
+        for index in range(len(series) - 1, -1, -1):
+            if views[index] != MISSING:
+                return series.timestamps[index], [series.columns[f'{metric}_{platform}'][index] for metric in METRICS]
+        return None, None
+    
+    def load_schedule(self):
+        """Restore the refresh schedule, starting pairs it does not know from their newest point in the history"""
+        pairs = {(video_id, platform) for video_id, platforms in SOCIAL_URLS.items() for platform in platforms}
+        self.scheduler = self._new_scheduler()
+        try:
+            stored = self.storage.read(REFRESH_SCHEDULE_FILE)
+            if stored is not None:
+                self.scheduler.load(stored[0], pairs)
+        except Exception as e:
+            app.logger.error(f"Error loading refresh schedule: {e}")
+        
+        for pair in sorted(pairs - set(self.scheduler.pairs)):
+            self.scheduler.add(pair, *self._last_fetched(*pair))
+    
+    def save_schedule(self):
+        try:
+            self.storage.write(REFRESH_SCHEDULE_FILE, self.scheduler.encode())
+        except Exception as e:
+            app.logger.error(f"Error saving refresh schedule: {e}")
+    
+    def compact(self):
+        """Fold the log into a freshly written base file and start an empty log"""
+        try:
+            # Fails if another writer replaced the base file since we read it
+            encoded = self.history.encode()
+            self.base_generation = self.storage.write(HISTORY_FILE, encoded, if_generation_match=self.base_generation or 0)
+            HISTORY_BYTES.set(len(encoded), file='base')
+            self.file_header = self.history.header()
+            # Log records are newer-than-base only, so a crash here just replays duplicates that get skipped
+            self.storage.write(HISTORY_LOG_FILE, b'')
+            HISTORY_BYTES.set(0, file='log')
+            self.log_records = 0
+            self.log_torn = False
+            self.pending = []
+            app.logger.info(f"Compacted data into {HISTORY_FILE}")
+        except PreconditionFailed:
+            app.logger.error(f"{HISTORY_FILE} was changed by another writer, reloading instead of compacting")
+            self.load_data()
+        except Exception as e:
+            app.logger.error(f"Error compacting data: {e}")
     
+    @HISTORY_SAVE_DURATION.time()
     def save_data(self):
+        """Append the pending points to the log, compacting when the log grows large"""
+        if self.history.header() != self.file_header or self.log_torn:
+            # New videos or columns: the base file layout has to be rewritten. A torn log is rewritten
+            # too, since a record appended after the partial one would be glued to it and lost.
+            self.compact()
+            return
+        
         try:
-            with open(DATA_FILE, 'w') as f:
-                json.dump(self.data, f, indent=2)
-            app.logger.info(f"Saved data to {DATA_FILE}")
+            records = encode_log_records(self.pending)
+            self.storage.append(HISTORY_LOG_FILE, records)
+            HISTORY_BYTES.inc(len(records), file='log')
+            self.log_records += len(self.pending)
+            app.logger.info(f"Appended {len(self.pending)} points to {HISTORY_LOG_FILE}")
+            self.pending = []
         except Exception as e:
             app.logger.error(f"Error saving data: {e}")
+            return
+        
+        if self.log_records >= COMPACT_AFTER:
+            self.compact()
     
-    def should_refresh(self):
-        if not self.data:
-            return True
+    def publish_snapshot(self, history=None, signature=None, rollups=None):
+        """Build a new read-only snapshot and make it the one served to requests.
+        
+        Without history, it is built from the history and rollups this process
+        refreshes. The snapshot gets copies of the rollups, which keep being
+        extended; without any, it builds its own from history.
+        """
+        with SNAPSHOT_BUILD_DURATION.time():
+            if history is None:
+                history, rollups = self.history, self.rollups
+            if rollups is not None:
+                rollups = {name: rollup.copy() for name, rollup in rollups.items()}
+            snapshot = Snapshot(history, signature or time.time_ns(), rollups)
+        HISTORY_POINTS.set(sum(len(series) for _, series in history.items()))
+        # Swap snapshot and signature together so readers never see a mismatched pair
+        self.published = (snapshot, signature)
+        self.events.notify()
+        return snapshot
+    
+    def _last_good_snapshot(self):
+        """The published snapshot, served while storage cannot be read; empty if there is none yet"""
+        snapshot = self.published[0]
+        return snapshot if snapshot is not None else Snapshot(History(VIDEOS), 0)
+    
+    def get_snapshot(self):
+        """Return the current snapshot, rebuilding it only if the data file changed.
         
-        # Check if any video has data points
-        for video_data in self.data.values():
-            if video_data:
-                latest_timestamp = max(point['timestamp'] for point in video_data)
-                if time.time() - latest_timestamp > REFRESH_INTERVAL:
-                    return True
+        If storage fails, the previous snapshot keeps being served and the new
+        signature is not recorded, so the next request tries again.
+        """
+        try:
+            signature = self._file_signature()
+        except Exception as e:
+            app.logger.error(f"Error checking stored data: {e}")
+            return self._last_good_snapshot()
+        snapshot, published_signature = self.published
+        if snapshot is not None and signature == published_signature:
+            return snapshot
         
-        return len([v for v in self.data.values() if v]) == 0
+        with self.snapshot_lock:
+            # Another request may have rebuilt it while we waited
+            snapshot, published_signature = self.published
+            if snapshot is not None and signature == published_signature:
+                return snapshot
+            try:
+                history, rollups = self._read_published(signature)
+            except Exception as e:
+                app.logger.error(f"Error loading data: {e}")
+                return self._last_good_snapshot()
+            return self.publish_snapshot(history, signature, rollups)
+    
+    def _read_published(self, signature):
+        """Bring the history and rollups that get_snapshot publishes up to date with storage.
+        
+        While the base file keeps its signature, the log has only been appended
+        to since the last read: just the new records are replayed, and they are
+        carried forward into the rollups instead of rebuilding every tier from
+        the whole history. A compaction changes the base file, and the next
+        read starts over. Called with snapshot_lock held.
+        """
+        base = signature[0] if signature is not None else None
+        reader = self.reader
+        if reader is not None and reader['base'] == base:
+            stored_log = self.storage.read(HISTORY_LOG_FILE)
+            raw = stored_log[0] if stored_log is not None else b''
+            HISTORY_BYTES.set(len(raw), file='log')
+            offset = reader['log_offset']
+            if len(raw) >= offset and raw[offset - 1:offset] in (b'', b'\n'):
+                appended = []
+                reader['history'].replay_log(raw[offset:], appended)
+                reader['log_offset'] = offset + raw[offset:].rfind(b'\n') + 1
+                latest = reader['latest']
+                for video_id, entry in appended:
+                    latest[video_id] = filled = carry_forward_entry(entry, latest.get(video_id))
+                    for rollup in reader['rollups'].values():
+                        rollup.append(video_id, filled)
+                return reader['history'], reader['rollups']
+            # The log shrank without the base file changing signature yet: a compaction is under way
+        
+        self.reader = None
+        history, _, _, _, log_offset = self._read_history()
+        filled = carry_forward(history)
+        latest = {video_id: series.point(len(series) - 1) for video_id, series in filled.items() if len(series)}
+        self.reader = {
+            'base': base, 'log_offset': log_offset, 'history': history, 'rollups': build_rollups(filled), 'latest': latest
+        }
+        return history, self.reader['rollups']
+    
+    def should_refresh(self):
+        """Whether any video/platform pair is due; O(1), the scheduler keeps the earliest due time at hand"""
+        next_due = self.scheduler.next_due()
+        return next_due is None or next_due <= time.time()
     
     def fetch_social_data(self, platform, url):
         return self.fetcher.fetch_data(platform, url)
     
-    def refresh_data(self):
-        with self.lock:
-            if not self.should_refresh():
+    def fetch_platform(self, platform, video_urls):
+        """Fetch all videos of a single platform. Runs in its own worker thread."""
+        results = {}
+        try:
+            batch = self.fetcher.fetch_batch(platform, list(video_urls.values()))
+        except Exception as e:
+            app.logger.error(f"Error fetching {platform} data: {e}")
+            return results
+        
+        for video_id, url in video_urls.items():
+            if batch.get(url) is not None:
+                results[video_id] = batch[url]
+                app.logger.info(f"Fetched {platform} data for {video_id}")
+            else:
+                app.logger.error(f"No {platform} data returned for {video_id}")
+        return results
+    
+    def fetch_all(self, pairs=None):
+        """Fetch the given (video_id, platform) pairs, default all of them, running the platforms in parallel"""
+        if pairs is None:
+            pairs = [(video_id, platform) for video_id, platforms in SOCIAL_URLS.items() for platform in platforms]
+        platform_urls = {}
+        for video_id, platform in pairs:
+            platform_urls.setdefault(platform, {})[video_id] = SOCIAL_URLS[video_id][platform]
+        
+        with ThreadPoolExecutor(max_workers=len(platform_urls), thread_name_prefix='fetch') as pool:
+            futures = {
+                platform: pool.submit(self.fetch_platform, platform, video_urls)
+                for platform, video_urls in platform_urls.items()
+            }
+            return {platform: future.result() for platform, future in futures.items()}
+    
+    def refresh_data(self, force=False):
+        """Fetch the video/platform pairs that are due (every pair if force) and save the new points"""
+        with self.lock, self.refresh_lease() as owned:
+            if not owned:
+                app.logger.info("Another process holds the refresh lease, skipping refresh")
+                return
+            
+            # Pick up whatever another lease holder wrote before deciding and appending
+            if not self.reload_if_changed():
+                app.logger.error("Could not read the stored history, skipping refresh")
+                return
+            started = time.time()
+            pairs = list(self.scheduler.pairs) if force else self.scheduler.due(started)
+            if not pairs:
+                return
+            
+            app.logger.info(f"Starting data refresh of {len(pairs)} of {len(self.scheduler.pairs)} video/platform pairs...")
+            timestamp = int(started)
+            results = self.fetch_all(pairs)
+            
+            # Renewing doubles as a fencing check: if the lease expired mid-fetch, someone else may be writing
+            if not self._acquire_lease():
+                app.logger.error("Lost the refresh lease while fetching, discarding results")
                 return
             
-            app.logger.info("Starting data refresh...")
-            timestamp = int(time.time())
+            due_platforms = {}
+            for video_id, platform in pairs:
+                due_platforms.setdefault(video_id, set()).add(platform)
             
             for video_id, platforms in SOCIAL_URLS.items():
-                total_views = 0
-                total_likes = 0
-                total_comments = 0
-                platform_data = {}
+                if video_id not in due_platforms:
+                    continue
+                
+                observed = {}
+                carried = {}
+                for platform in platforms:
+                    pair = (video_id, platform)
+                    if platform in due_platforms[video_id]:
+                        data = results.get(platform, {}).get(video_id)
+                        if data is not None:
+                            observed[platform] = [data['views'], data['likes'], data['comments']]
+                            self.scheduler.record(pair, timestamp, observed[platform])
+                            continue
+                        self.scheduler.record_failure(pair, timestamp)
+                    # Not due or not fetched: stored as missing, its last fetched values only count towards the totals
+                    if self.scheduler.pairs[pair]['metrics']:
+                        carried[platform] = self.scheduler.pairs[pair]['metrics']
+                
+                if not observed:
+                    continue
                 
-                for platform, url in platforms.items():
-                    try:
-                        data = self.fetch_social_data(platform, url)
-                        total_views += data['views']
-                        total_likes += data['likes']
-                        total_comments += data['comments']
-                        
-                        platform_data[f'views_{platform}'] = data['views']
-                        platform_data[f'likes_{platform}'] = data['likes']
-                        platform_data[f'comments_{platform}'] = data['comments']
-                        
-                        app.logger.info(f"Fetched {platform} data for {video_id}")
-                    except Exception as e:
-                        app.logger.error(f"Error fetching {platform} data for {video_id}: {e}")
+                entry = {'timestamp': timestamp}
+                for total_name, values in zip(TOTAL_COLUMNS, zip(*observed.values(), *carried.values())):
+                    entry[total_name] = sum(values)
+                for platform, metrics in observed.items():
+                    for metric, value in zip(METRICS, metrics):
+                        entry[f'{metric}_{platform}'] = value
                 
-                entry = {
-                    'timestamp': timestamp,
-                    'total_views': total_views,
-                    'total_likes': total_likes,
-                    'total_comments': total_comments,
-                    **platform_data
-                }
+                # Rollups hold carried-forward values, like the ones built from the whole history
+                filled = dict(entry)
+                for platform, metrics in carried.items():
+                    for metric, value in zip(METRICS, metrics):
+                        filled[f'{metric}_{platform}'] = value
+                filled[CARRIED_COLUMN] = sum(1 << PLATFORMS.index(platform) for platform in carried)
                 
-                if video_id not in self.data:
-                    self.data[video_id] = []
-                self.data[video_id].append(entry)
+                self.history.append(video_id, entry)
+                for rollup in self.rollups.values():
+                    rollup.append(video_id, filled)
+                self.pending.append((video_id, entry))
             
             self.save_data()
-            app.logger.info("Data refresh completed")
-
-data_manager = DataManager()
+            self.save_schedule()
+            # Points that could not be saved are still pending: reload the stored history next time
+            self.stored_signature = False
+            if not self.pending:
+                try:
+                    self.stored_signature = self._stored_signature()
+                except Exception as e:
+                    app.logger.error(f"Error checking stored data: {e}")
+            self.publish_snapshot(signature=self.stored_signature[0] if self.stored_signature else None)
+            REFRESH_DURATION.observe(time.time() - started)
+            next_due = self.scheduler.next_due()
+            next_refresh = f"next pair due in {next_due - time.time():.0f} seconds" if next_due is not None else "no pairs scheduled"
+            app.logger.info(f"Data refresh completed in {time.time() - started:.1f} seconds, {next_refresh}")
 
 def get_latest_video_scores():
-    # Reload data from file to get latest updates
-    data_manager.load_data()
-    
-    scores = {}
-    for video_id, video_data in data_manager.data.items():
-        if video_data:
-            latest = video_data[-1]
-            scores[video_id] = {
-                'name': VIDEOS[video_id],
-                'combined': latest['total_views'] + latest['total_likes'] + latest['total_comments'],
-                'views': latest['total_views'],
-                'likes': latest['total_likes'],
-                'comments': latest['total_comments'],
-                # Platform-specific data for frontend recalculation
-                'views_youtube': latest.get('views_youtube', 0),
-                'likes_youtube': latest.get('likes_youtube', 0),
-                'comments_youtube': latest.get('comments_youtube', 0),
-                'views_tiktok': latest.get('views_tiktok', 0),
-                'likes_tiktok': latest.get('likes_tiktok', 0),
-                'comments_tiktok': latest.get('comments_tiktok', 0),
-                'views_tumblr': latest.get('views_tumblr', 0),
-                'likes_tumblr': latest.get('likes_tumblr', 0),
-                'comments_tumblr': latest.get('comments_tumblr', 0),
-                'views_instagram': latest.get('views_instagram', 0),
-                'likes_instagram': latest.get('likes_instagram', 0),
-                'comments_instagram': latest.get('comments_instagram', 0),
-                'views_threads': latest.get('views_threads', 0),
-                'likes_threads': latest.get('likes_threads', 0),
-                'comments_threads': latest.get('comments_threads', 0),
-                'views_bluesky': latest.get('views_bluesky', 0),
-                'likes_bluesky': latest.get('likes_bluesky', 0),
-                'comments_bluesky': latest.get('comments_bluesky', 0)
-            }
-    return scores
+    return data_manager.get_snapshot().video_scores
 
 def get_player_scores():
-    video_scores = get_latest_video_scores()
-    player_scores = {}
-    
-    for player, videos in PLAYER_VIDEOS.items():
-        combined = views = likes = comments = 0
-        
-        for video_spec in videos:
-            if isinstance(video_spec, tuple):
-                video_id, weight = video_spec
-            else:
-                video_id, weight = video_spec, 1.0
-            
-            if video_id in video_scores:
-                video_score = video_scores[video_id]
-                combined += video_score['combined'] * weight
-                views += video_score['views'] * weight
-                likes += video_score['likes'] * weight
-                comments += video_score['comments'] * weight
-        
-        player_scores[player] = {
-            'name': player,
-            'combined': int(combined),
-            'views': int(views),
-            'likes': int(likes),
-            'comments': int(comments)
-        }
-    
-    return player_scores
+    return data_manager.get_snapshot().player_scores
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.get('request_started')
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - started, endpoint=endpoint, method=request.method, status=response.status_code
+        )
+    return response
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def cached_json_response(name, payload_getter):
+    """Serve a snapshot payload with a strong ETag, answering 304 when the client has it"""
+    snapshot = data_manager.get_snapshot()
+    body, etag = snapshot.serialized(name, lambda: payload_getter(snapshot))
+    
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Clients may keep the body but must revalidate it on every poll
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def json_error(message, status=400):
+    return Response(json.dumps({'error': message}), status=status, mimetype='application/json')
+
+def _int_arg(args, name, minimum=None):
+    value = args.get(name, '')
+    if value == '':
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    if minimum is not None and number < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    return number
+
+def _list_arg(args, name, allowed):
+    """Comma-separated subset of allowed, in the order of allowed; all of them when absent"""
+    if name not in args:
+        return list(allowed)
+    values = [value for value in args[name].split(',') if value]
+    unknown = [value for value in values if value not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown {name}: {', '.join(unknown)}")
+    return [value for value in allowed if value in values]
+
+def parse_trend_query(args):
+    """Keyword arguments for build_trend_window from /api/trends query parameters; raises ValueError"""
+    since = _int_arg(args, 'since')
+    after = _int_arg(args, 'after')
+    if after is not None:
+        # Polling clients pass the newest timestamp they hold and only get newer points
+        since = after + 1 if since is None else max(since, after + 1)
+    return {
+        'since': since,
+        'until': _int_arg(args, 'until'),
+        'max_points': _int_arg(args, 'max_points', minimum=2),
+        'metrics': _list_arg(args, 'metrics', TREND_METRICS),
+        'platforms': _list_arg(args, 'platforms', PLATFORMS),
+    }
+
 @app.route('/api/videos')
 def api_videos():
-    return jsonify(get_latest_video_scores())
+    return cached_json_response('videos', lambda snapshot: snapshot.video_scores)
 
 @app.route('/api/players')
 def api_players():
-    return jsonify(get_player_scores())
+    return cached_json_response('players', lambda snapshot: snapshot.player_scores)
+
+def trends_payload(snapshot, query):
+    """The stored trends for an unfiltered query, otherwise the window it asks for"""
+    if query == parse_trend_query({}):
+        return snapshot.trends
+    return build_trend_window(snapshot, **query)
 
 @app.route('/api/trends')
 def api_trends():
-    # Reload data from file to get latest updates
-    data_manager.load_data()
+    """Trends, optionally limited to since/until or to points after a timestamp (Unix seconds),
+    downsampled to max_points per line and restricted to some metrics and platforms"""
+    try:
+        query = parse_trend_query(request.args)
+    except ValueError as e:
+        return json_error(str(e))
     
-    trends = {'videos': {}, 'players': {}}
+    name = 'trends' if query == parse_trend_query({}) else 'trends?' + json.dumps(query, sort_keys=True)
+    return cached_json_response(name, lambda snapshot: trends_payload(snapshot, query))
+
+@app.route('/api/dashboard')
+def api_dashboard():
+    """Videos, players and trends from one snapshot in a single response.
     
-    # Video trends
-    for video_id, video_data in data_manager.data.items():
-        if video_data:
-            trends['videos'][video_id] = {
-                'name': VIDEOS[video_id],
-                'data': [{
-                    'timestamp': point['timestamp'],
-                    'combined': point['total_views'] + point['total_likes'] + point['total_comments'],
-                    'views': point['total_views'],
-                    'likes': point['total_likes'],
-                    'comments': point['total_comments'],
-                    # Platform-specific data for frontend recalculation
-                    'views_youtube': point.get('views_youtube', 0),
-                    'likes_youtube': point.get('likes_youtube', 0),
-                    'comments_youtube': point.get('comments_youtube', 0),
-                    'views_tiktok': point.get('views_tiktok', 0),
-                    'likes_tiktok': point.get('likes_tiktok', 0),
-                    'comments_tiktok': point.get('comments_tiktok', 0),
-                    'views_tumblr': point.get('views_tumblr', 0),
-                    'likes_tumblr': point.get('likes_tumblr', 0),
-                    'comments_tumblr': point.get('comments_tumblr', 0),
-                    'views_instagram': point.get('views_instagram', 0),
-                    'likes_instagram': point.get('likes_instagram', 0),
-                    'comments_instagram': point.get('comments_instagram', 0),
-                    'views_threads': point.get('views_threads', 0),
-                    'likes_threads': point.get('likes_threads', 0),
-                    'comments_threads': point.get('comments_threads', 0),
-                    'views_bluesky': point.get('views_bluesky', 0),
-                    'likes_bluesky': point.get('likes_bluesky', 0),
-                    'comments_bluesky': point.get('comments_bluesky', 0)
-                } for point in video_data]
-            }
+    sections picks a subset (default all three); the /api/trends parameters
+    apply to the trends section.
+    """
+    try:
+        sections = _list_arg(request.args, 'sections', DASHBOARD_SECTIONS)
+        query = parse_trend_query(request.args)
+    except ValueError as e:
+        return json_error(str(e))
     
-    # Player trends
-    for player in PLAYER_VIDEOS.keys():
-        player_data = []
-        
-        # Get all timestamps
-        all_timestamps = set()
-        for video_data in data_manager.data.values():
-            all_timestamps.update(point['timestamp'] for point in video_data)
-        
-        for timestamp in sorted(all_timestamps):
-            combined = views = likes = comments = 0
-            
-            for video_spec in PLAYER_VIDEOS[player]:
-                if isinstance(video_spec, tuple):
-                    video_id, weight = video_spec
-                else:
-                    video_id, weight = video_spec, 1.0
-                
-                # Find data point for this timestamp
-                video_data = data_manager.data.get(video_id, [])
-                point = next((p for p in video_data if p['timestamp'] == timestamp), None)
-                
-                if point:
-                    combined += (point['total_views'] + point['total_likes'] + point['total_comments']) * weight
-                    views += point['total_views'] * weight
-                    likes += point['total_likes'] * weight
-                    comments += point['total_comments'] * weight
-            
-            player_data.append({
-                'timestamp': timestamp,
-                'combined': int(combined),
-                'views': int(views),
-                'likes': int(likes),
-                'comments': int(comments)
-            })
-        
-        trends['players'][player] = {
-            'name': player,
-            'data': player_data
-        }
+    def build(snapshot):
+        payload = {}
+        if 'videos' in sections:
+            payload['videos'] = snapshot.video_scores
+        if 'players' in sections:
+            payload['players'] = snapshot.player_scores
+        if 'trends' in sections:
+            payload['trends'] = trends_payload(snapshot, query)
+        return payload
+    
+    return cached_json_response('dashboard?' + json.dumps({'sections': sections, **query}, sort_keys=True), build)
+
+def snapshot_event(snapshot):
+    """The SSE message announcing a snapshot, with its latest scores; encoded once per snapshot"""
+    body, _ = snapshot.serialized('event', lambda: {
+        'latest': snapshot.latest_timestamp,
+        'videos': snapshot.video_scores,
+        'players': snapshot.player_scores,
+    })
+    return b'event: snapshot\ndata: ' + body + b'\n\n'
+
+@app.route('/api/events')
+def api_events():
+    """Server-Sent Events: a snapshot event on connect and each time a new snapshot is published"""
+    manager = data_manager
+    events = manager.events
+    if not events.open_stream():
+        return json_error("Too many open event streams, poll the API instead", 503)
+    
+    def stream():
+        sequence = events.sequence
+        snapshot = manager.get_snapshot()
+        yield b'retry: 5000\n\n' + snapshot_event(snapshot)
+        while True:
+            # Idle streams sleep on a condition variable until a publish or the keepalive timeout
+            sequence = events.wait(sequence, EVENT_KEEPALIVE)
+            # Also notices data written by another worker since the last check
+            current = manager.get_snapshot()
+            if current is snapshot:
+                yield b': keepalive\n\n'
+            else:
+                snapshot = current
+                yield snapshot_event(snapshot)
     
-    return jsonify(trends)
+    response = Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Runs when the server closes the response, also for HEAD requests whose body is never iterated
+    response.call_on_close(events.close_stream)
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics of this process"""
+    # Brings the history gauges up to date with what is stored
+    data_manager.get_snapshot()
+    EVENT_STREAMS.set(data_manager.events.streams)
+    return Response(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
 
 data_manager = DataManager()
 _initialized = False
 
+def refresh_if_stale():
+    """One scheduler tick: refresh the video/platform pairs that are due, if any"""
+    if data_manager.should_refresh():
+        app.logger.info("Data is stale, starting refresh...")
+        data_manager.refresh_data()
+    else:
+        app.logger.info("Data is fresh, skipping refresh.")
+
 def initialize_app():
-    """Initialize the application with data loading and background refresh"""
+    """Load the data and run the refresher in a background thread of this process.
+    
+    Only used by the development server and EMBEDDED_REFRESH; otherwise refresh_worker.py refreshes the data and
+    the web server just serves whatever it finds in storage.
+    """
     global _initialized
     if _initialized:
         app.logger.info("App already initialized, skipping...")
@@ -406,16 +1175,15 @@ def initialize_app():
     app.logger.info("Loading data...")
     data_manager.load_data()
 
-    app.logger.info(f"Data refresh every {REFRESH_INTERVAL} seconds")
+    app.logger.info(f"Each video/platform pair refreshed every {REFRESH_MIN_INTERVAL} to {REFRESH_MAX_INTERVAL} seconds")
 
     # Start background refresh
     def background_refresh():
         while True:
-            if data_manager.should_refresh():
-                app.logger.info("Data is stale, starting refresh...")
-                data_manager.refresh_data()
-            else:
-                app.logger.info("Data is fresh, skipping refresh.")
+            try:
+                refresh_if_stale()
+            except Exception as e:
+                app.logger.error(f"Refresh failed, retrying on the next check: {e}")
             
             # Check every minute if we need to refresh
             app.logger.info("Sleeping for 60 seconds before next check...")
@@ -426,9 +1194,10 @@ def initialize_app():
 
     app.logger.info("App initialization complete. Data refresh running in background.")
 
-with app.app_context():
-    if __name__ != '__main__':
-        # Running under gunicorn
+# gunicorn imports the app in its master when preloading, and threads do not survive the fork into the workers:
+# there, the post_fork hook in gunicorn.conf.py starts the refresher in each worker instead
+if EMBEDDED_REFRESH and __name__ != '__main__' and 'gunicorn' not in sys.modules:
+    with app.app_context():
         initialize_app()
 
 if __name__ == '__main__':
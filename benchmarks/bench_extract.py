@@ -0,0 +1,86 @@
+"""CPU time per page for Threads/Instagram metric extraction on saved HTML fixtures.
+
+Compares html_metrics.extract_metrics with the regex loop the scrapers used
+before it (kept here only as a baseline).
+
+    python benchmarks/bench_extract.py [--iterations 20]
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from html_metrics import extract_large_numbers, extract_metrics  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def legacy_extract(html):
+    """The previous Threads strategy: recompiled pattern loops over the whole page"""
+    json_patterns = [
+        r'<script[^>]*>\s*window\.__INITIAL_DATA__\s*=\s*({.*?});?\s*</script>',
+        r'<script[^>]*>\s*window\.__STATE__\s*=\s*({.*?});?\s*</script>',
+        r'"thread_items":\s*\[(.*?)\]',
+        r'"media_overlay_info":\s*({[^}]*"view_count"[^}]*})',
+    ]
+    for pattern in json_patterns:
+        for match in re.findall(pattern, html, re.DOTALL | re.IGNORECASE):
+            view_match = re.search(r'"view_count"[":]*\s*(\d+)', match)
+            like_match = re.search(r'"like_count"[":]*\s*(\d+)', match)
+            reply_match = re.search(r'"reply_count"[":]*\s*(\d+)', match)
+            if view_match or like_match or reply_match:
+                return {'views': int(view_match.group(1)) if view_match else 0}
+
+    enhanced_patterns = [
+        r'"viewCount"[":]*\s*(\d+)', r'"view_count"[":]*\s*(\d+)', r'views[":]*\s*(\d+(?:,\d+)*)',
+        r'(\d+(?:,\d+)*)\s*views', r'(\d+(?:\.\d+)?[KMB])\s*views',
+        r'"likeCount"[":]*\s*(\d+)', r'"like_count"[":]*\s*(\d+)', r'likes[":]*\s*(\d+(?:,\d+)*)',
+        r'(\d+(?:,\d+)*)\s*likes', r'(\d+(?:\.\d+)?[KMB])\s*likes',
+        r'"replyCount"[":]*\s*(\d+)', r'"reply_count"[":]*\s*(\d+)', r'replies[":]*\s*(\d+(?:,\d+)*)',
+        r'(\d+(?:,\d+)*)\s*replies', r'(\d+(?:\.\d+)?[KMB])\s*replies',
+    ]
+    found = [re.findall(pattern, html, re.IGNORECASE) for pattern in enhanced_patterns]
+    if any(found):
+        return {'matches': sum(len(f) for f in found)}
+    return {'numbers': len(re.findall(r'\b(\d{3,})\b', html))}
+
+
+def current_extract(html):
+    metrics, _ = extract_metrics(html)
+    if metrics:
+        return metrics
+    return {'numbers': len(extract_large_numbers(html, 1000, 10000000))}
+
+
+def cpu_time_per_call(func, html, iterations):
+    func(html)  # warm up
+    started = time.process_time()
+    for _ in range(iterations):
+        func(html)
+    return (time.process_time() - started) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'fixture':<28}{'size':>10}{'legacy ms':>12}{'current ms':>12}{'speedup':>9}  metrics")
+    paths = glob.glob(os.path.join(FIXTURES, 'threads_*.html')) + glob.glob(os.path.join(FIXTURES, 'instagram_*.html'))
+    for path in sorted(paths):
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+        legacy = cpu_time_per_call(legacy_extract, html, args.iterations)
+        current = cpu_time_per_call(current_extract, html, args.iterations)
+        print(
+            f"{os.path.basename(path):<28}{len(html) // 1024:>8}KB"
+            f"{legacy * 1000:>12.2f}{current * 1000:>12.2f}{legacy / current:>8.1f}x  {current_extract(html)}"
+        )
+
+
+if __name__ == '__main__':
+    main()
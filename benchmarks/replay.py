@@ -0,0 +1,113 @@
+"""Serve recorded platform responses to SocialMediaFetcher without touching the network."""
+import json
+import os
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import BaseAdapter
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# (host, path prefix) -> fixture file. Instagram is special-cased in FixtureAdapter.route;
+# anything without a route answers 404.
+ROUTES = [
+    ('www.threads.com', '/', 'threads_post.html'),
+    ('www.tiktok.com', '/', 'tiktok_video.html'),
+    ('api.tumblr.com', '/v2/blog/', 'tumblr_posts.json'),
+    ('bsky.social', '/xrpc/com.atproto.server.createSession', 'bluesky_session.json'),
+    ('bsky.social', '/xrpc/com.atproto.server.refreshSession', 'bluesky_session.json'),
+    ('bsky.social', '/xrpc/com.atproto.identity.resolveHandle', 'bluesky_resolve_handle.json'),
+    ('bsky.social', '/xrpc/app.bsky.feed.getPosts', 'bluesky_get_posts.json'),
+]
+
+FIXTURE_ENV = {
+    'YOUTUBE_API_KEY': 'replay',
+    'TUMBLR_API_KEY': 'replay',
+    'BLUESKY_USERNAME': 'replay.bsky.social',
+    'BLUESKY_PASSWORD': 'replay',
+}
+
+
+def load_fixture(name, mode='rb'):
+    with open(os.path.join(FIXTURES, name), mode) as f:
+        return f.read()
+
+
+class FixtureAdapter(BaseAdapter):
+    """requests transport adapter that answers every request from the fixtures directory"""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+        self.bytes_served = 0
+        self._cache = {}
+
+    def route(self, url):
+        parsed = urlparse(url)
+        if parsed.hostname == 'www.instagram.com':
+            # The embed JSON endpoint is blocked for logged-out clients; the page itself works
+            return None if '/embed/' in parsed.path else 'instagram_reel.html'
+        for host, prefix, fixture in ROUTES:
+            if parsed.hostname == host and parsed.path.startswith(prefix):
+                return fixture
+        return None
+
+    def send(self, request, **kwargs):
+        self.requests.append(request.url)
+        fixture = self.route(request.url)
+
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        response.encoding = 'utf-8'
+        if fixture is None:
+            response.status_code = 404
+            response._content = b''
+            return response
+
+        if fixture not in self._cache:
+            self._cache[fixture] = load_fixture(fixture)
+        response.status_code = 200
+        response._content = self._cache[fixture]
+        response.headers['Content-Type'] = 'application/json' if fixture.endswith('.json') else 'text/html'
+        self.bytes_served += len(response._content)
+        return response
+
+    def close(self):
+        pass
+
+
+class FakeYouTubeClient:
+    """Stands in for the googleapiclient YouTube resource, answering from youtube_videos.json"""
+
+    def __init__(self):
+        self.items = {item['id']: item for item in json.loads(load_fixture('youtube_videos.json'))['items']}
+        self.calls = 0
+
+    def videos(self):
+        return self
+
+    def list(self, part, id, **kwargs):
+        self.calls += 1
+        items = [self.items[video_id] for video_id in id.split(',') if video_id in self.items]
+        return _Request({'kind': 'youtube#videoListResponse', 'items': items})
+
+
+class _Request:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self, http=None, num_retries=0):
+        return self.response
+
+
+def install(fetcher, rate_limit=False):
+    """Route a SocialMediaFetcher's traffic to the fixtures. Returns the adapter for inspection."""
+    os.environ.update(FIXTURE_ENV)
+    adapter = FixtureAdapter()
+    fetcher.session.mount('http://', adapter)
+    fetcher.session.mount('https://', adapter)
+    fetcher._youtube = FakeYouTubeClient()
+    if not rate_limit:
+        fetcher._rate_limit = lambda platform: None
+    return adapter
@@ -0,0 +1,311 @@
+"""Offline benchmark suite for the fetch and API paths.
+
+Replays recorded platform responses through SocialMediaFetcher, times
+DataManager.refresh_data end to end with rate limiting switched off, and
+load-tests the API endpoints against synthetic histories. Nothing touches the
+network. Results are written as flat JSON so two runs can be compared:
+
+    python benchmarks/run.py --output before.json
+    python benchmarks/run.py --output after.json --compare before.json
+
+--profile instead reports wall time and peak traced memory of every
+DataManager operation and API handler on realistic histories of each size:
+
+    python benchmarks/run.py --profile --sizes 10000,100000,1000000
+"""
+import argparse
+import json
+import logging
+import os
+import platform as platform_info
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+# Keep every file the app touches inside a scratch directory
+WORK_DIR = tempfile.mkdtemp(prefix='fools-gold-bench-')
+os.environ['DATA_FILE'] = os.path.join(WORK_DIR, 'engagement_data.json')
+os.environ['STORAGE_BACKEND'] = 'local'
+
+import synthetic  # noqa: E402
+from timeseries import History, encode_log_records  # noqa: E402
+
+ENDPOINTS = {
+    'videos': '/api/videos',
+    'players': '/api/players',
+    'trends': '/api/trends',
+    'trends_1000': '/api/trends?max_points=1000',
+    'dashboard_1000': '/api/dashboard?max_points=1000',
+}
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+def write_history(app_module, history):
+    """Replace the stored history with `history` and return a DataManager with no cached snapshot"""
+    for path in (app_module.HISTORY_FILE, app_module.HISTORY_LOG_FILE):
+        if os.path.exists(path):
+            os.remove(path)
+    with open(app_module.HISTORY_FILE, 'wb') as f:
+        f.write(history.encode())
+    return app_module.DataManager()
+
+
+def bench_extract(results, iterations):
+    import bench_extract
+    for name in ('threads_post', 'instagram_reel', 'instagram_reel_text'):
+        with open(os.path.join(BENCH_DIR, 'fixtures', f'{name}.html'), encoding='utf-8') as f:
+            html = f.read()
+        results[f'extract.{name}.cpu_ms'] = bench_extract.cpu_time_per_call(bench_extract.current_extract, html, iterations) * 1000
+
+
+def bench_fetch(app_module, results, iterations):
+    import replay
+    from social_fetcher import SocialMediaFetcher
+
+    platform_urls = {}
+    for video_id, platforms in app_module.SOCIAL_URLS.items():
+        for platform, url in platforms.items():
+            platform_urls.setdefault(platform, []).append(url)
+
+    for platform, urls in platform_urls.items():
+        fetcher = SocialMediaFetcher()
+        adapter = replay.install(fetcher)
+        samples = []
+        for _ in range(iterations):
+            elapsed, batch = timed(fetcher.fetch_batch, platform, urls)
+            samples.append(elapsed)
+        results[f'fetch.{platform}.batch_ms'] = statistics.median(samples) * 1000
+        # The YouTube client talks to googleapiclient rather than the session
+        requests_made = len(adapter.requests) + fetcher._youtube.calls
+        results[f'fetch.{platform}.requests_per_batch'] = requests_made / iterations
+        results[f'fetch.{platform}.bytes_per_batch'] = adapter.bytes_served / iterations
+
+
+def bench_refresh(app_module, results, iterations):
+    import replay
+
+    data_manager = write_history(app_module, History(app_module.VIDEOS))
+    data_manager.load_data()
+    replay.install(data_manager.fetcher)
+
+    samples = [timed(data_manager.refresh_data, force=True)[0] for _ in range(iterations)]
+    results['refresh.total_ms'] = statistics.median(samples) * 1000
+
+
+def bench_api(app_module, results, sizes, iterations):
+    client = app_module.app.test_client()
+    for size in sizes:
+        history = synthetic.make_history(size, list(app_module.VIDEOS))
+        app_module.data_manager = write_history(app_module, history)
+        app_module.data_manager.load_data()
+        prefix = f'api.{size}'
+
+        elapsed, _ = timed(app_module.data_manager.get_snapshot)
+        results[f'{prefix}.snapshot_ms'] = elapsed * 1000
+
+        for name, endpoint in ENDPOINTS.items():
+            elapsed, response = timed(client.get, endpoint)
+            results[f'{prefix}.{name}.first_ms'] = elapsed * 1000
+            results[f'{prefix}.{name}.bytes'] = len(response.data)
+
+            samples = [timed(client.get, endpoint)[0] for _ in range(iterations)]
+            results[f'{prefix}.{name}.p50_ms'] = percentile(samples, 0.5) * 1000
+            results[f'{prefix}.{name}.p95_ms'] = percentile(samples, 0.95) * 1000
+
+            etag = response.headers.get('ETag')
+            if etag:
+                samples = [timed(client.get, endpoint, headers={'If-None-Match': etag})[0] for _ in range(iterations)]
+                results[f'{prefix}.{name}.not_modified_p50_ms'] = percentile(samples, 0.5) * 1000
+
+
+def measure(prepare, operation):
+    """Return (seconds, peak bytes) of operation(state) for a fresh state = prepare().
+
+    Time and memory are taken in separate runs because tracemalloc slows
+    allocation-heavy code down several times.
+    """
+    state = prepare()
+    elapsed = timed(operation, state)[0]
+    state = prepare()
+    tracemalloc.start()
+    try:
+        operation(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def profile_scale(app_module, results, sizes):
+    import replay
+
+    client = app_module.app.test_client()
+    for size in sizes:
+        started = time.perf_counter()
+        history = synthetic.make_realistic_history(size, list(app_module.VIDEOS))
+        log = synthetic.split_log(history, app_module.COMPACT_AFTER // 2)
+        base_bytes = history.encode()
+        log_bytes = encode_log_records(log)
+        del history, log
+        print(f"Generated {size} points ({len(base_bytes) // 1024} KB) in {time.perf_counter() - started:.1f}s")
+        prefix = f'profile.{size}'
+        results[f'{prefix}.file_bytes'] = len(base_bytes) + len(log_bytes)
+
+        def restore_files():
+            with open(app_module.HISTORY_FILE, 'wb') as f:
+                f.write(base_bytes)
+            with open(app_module.HISTORY_LOG_FILE, 'wb') as f:
+                f.write(log_bytes)
+
+        def fresh_manager():
+            restore_files()
+            return app_module.DataManager()
+
+        def loaded_manager():
+            data_manager = fresh_manager()
+            data_manager.load_data()
+            return data_manager
+
+        def manager_with_pending():
+            data_manager = loaded_manager()
+            timestamp = int(time.time())
+            for video_id, series in data_manager.history.items():
+                entry = {**series.point(-1), 'timestamp': timestamp}
+                data_manager.history.append(video_id, entry)
+                data_manager.pending.append((video_id, entry))
+            return data_manager
+
+        def refreshing_manager():
+            data_manager = loaded_manager()
+            replay.install(data_manager.fetcher)
+            return data_manager
+
+        def warm_manager():
+            data_manager = fresh_manager()
+            data_manager.get_snapshot()
+            return data_manager
+
+        operations = {
+            'load_data': (fresh_manager, lambda manager: manager.load_data()),
+            'should_refresh': (loaded_manager, lambda manager: manager.should_refresh()),
+            'get_snapshot.cold': (fresh_manager, lambda manager: manager.get_snapshot()),
+            'get_snapshot.warm': (warm_manager, lambda manager: manager.get_snapshot()),
+            'save_data': (manager_with_pending, lambda manager: manager.save_data()),
+            'compact': (loaded_manager, lambda manager: manager.compact()),
+            'refresh_data': (refreshing_manager, lambda manager: manager.refresh_data(force=True)),
+        }
+        for name, (prepare, operation) in operations.items():
+            elapsed, peak = measure(prepare, operation)
+            results[f'{prefix}.{name}.ms'] = elapsed * 1000
+            results[f'{prefix}.{name}.peak_kb'] = peak / 1024
+
+        # Handlers: the first request serializes the snapshot payload, later ones reuse it
+        app_module.data_manager = warm_manager()
+        app_module.data_manager.load_data()
+
+        def unserialized_snapshot():
+            app_module.data_manager.published[0]._serialized.clear()
+
+        for name, endpoint in ENDPOINTS.items():
+            elapsed, peak = measure(unserialized_snapshot, lambda _: client.get(endpoint))
+            results[f'{prefix}.{name}.first.ms'] = elapsed * 1000
+            results[f'{prefix}.{name}.first.peak_kb'] = peak / 1024
+            elapsed, peak = measure(lambda: None, lambda _: client.get(endpoint))
+            results[f'{prefix}.{name}.warm.ms'] = elapsed * 1000
+            results[f'{prefix}.{name}.warm.peak_kb'] = peak / 1024
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+    print(f"\n{'metric':<48}{'baseline':>14}{'current':>14}{'change':>10}")
+    for key, value in results.items():
+        if key not in baseline:
+            continue
+        before = baseline[key]
+        change = f"{(value - before) / before * 100:+.1f}%" if before else 'n/a'
+        print(f"{key:<48}{before:>14.2f}{value:>14.2f}{change:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', help="Comma-separated history sizes (total points); default 1000,10000,100000 "
+                                         "or 10000,100000,1000000 with --profile")
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help="Previous results file to compare against")
+    parser.add_argument('--only', help="Comma-separated subset of: extract,fetch,refresh,api")
+    parser.add_argument('--profile', action='store_true', help="Profile time and peak memory per operation instead")
+    args = parser.parse_args()
+    sections = set(args.only.split(',')) if args.only else {'extract', 'fetch', 'refresh', 'api'}
+    if args.profile:
+        sections = {'profile'}
+    sizes = [int(size) for size in (args.sizes or ('10000,100000,1000000' if args.profile else '1000,10000,100000')).split(',')]
+
+    import app as app_module
+    # Refresh and fetch progress logs would drown the report
+    app_module.app.logger.setLevel(logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = {}
+    if 'extract' in sections:
+        bench_extract(results, args.iterations)
+    if 'fetch' in sections:
+        bench_fetch(app_module, results, args.iterations)
+    if 'refresh' in sections:
+        bench_refresh(app_module, results, max(3, args.iterations // 5))
+    if 'api' in sections:
+        bench_api(app_module, results, sizes, args.iterations)
+    if 'profile' in sections:
+        profile_scale(app_module, results, sizes)
+
+    report = {
+        'meta': {
+            'timestamp': int(time.time()),
+            'git_revision': git_revision(),
+            'python': platform_info.python_version(),
+            'machine': platform_info.machine(),
+            'iterations': args.iterations,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    for key, value in results.items():
+        print(f"{key:<48}{value:>14.2f}")
+    print(f"\nWrote {len(results)} results to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
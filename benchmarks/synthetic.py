@@ -0,0 +1,244 @@
+"""Synthetic engagement histories for benchmarks.
+
+make_history builds small, perfectly regular histories. make_realistic_history
+builds the shape a long-running instance actually accumulates: videos added
+over time, jittered refresh timestamps with restarts and outages, platforms
+that start being tracked late, and scraper failure streaks stored as missing
+values. It writes columns directly, so millions of points take seconds.
+
+    python benchmarks/synthetic.py --points 1000000 --output engagement_data.fgts
+    python benchmarks/synthetic.py --points 100000 --output engagement_data.json  # legacy JSON
+"""
+import argparse
+import array
+import ast
+import json
+import math
+import os
+import random
+import sys
+import time
+from bisect import bisect_left
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from timeseries import MISSING, PLATFORMS, History, encode_log_records  # noqa: E402
+
+REFRESH_SECONDS = 4 * 60 * 60
+COLLECTION_START = 1751328000  # 2025-07-01 00:00 UTC, when the production instance started
+
+# Mean length in points of a run of failed fetches, and points between failure runs.
+# Scraped platforms break far more often than the APIs do.
+FAILURE_RUNS = {
+    'youtube': (1, 2000),
+    'tumblr': (2, 500),
+    'bluesky': (2, 500),
+    'tiktok': (4, 80),
+    'instagram': (6, 50),
+    'threads': (6, 60),
+}
+
+
+def make_history(total_points, videos, end=None, interval=REFRESH_SECONDS, seed=0):
+    """A history of about total_points points spread evenly over the videos, ending at `end`"""
+    rng = random.Random(seed)
+    end = int(end or time.time())
+    per_video = max(1, total_points // len(videos))
+    start = end - (per_video - 1) * interval
+
+    history = History(videos)
+    for video_id in videos:
+        counts = {platform: [rng.randint(100, 5000), rng.randint(10, 500), rng.randint(1, 50)] for platform in PLATFORMS}
+        for step in range(per_video):
+            entry = {'timestamp': start + step * interval}
+            for platform, values in counts.items():
+                # Engagement only ever grows
+                values[0] += rng.randint(0, 400)
+                values[1] += rng.randint(0, 40)
+                values[2] += rng.randint(0, 4)
+                entry[f'views_{platform}'], entry[f'likes_{platform}'], entry[f'comments_{platform}'] = values
+            entry['total_views'] = sum(values[0] for values in counts.values())
+            entry['total_likes'] = sum(values[1] for values in counts.values())
+            entry['total_comments'] = sum(values[2] for values in counts.values())
+            history.append(video_id, entry)
+    return history
+
+
+def _refresh_timeline(rng, begin, end, count):
+    """count strictly increasing refresh times in [begin, end] with jitter, restarts and outages"""
+    deltas = []
+    for _ in range(count - 1):
+        roll = rng.random()
+        if roll < 0.002:
+            deltas.append(rng.uniform(20, 120))  # Outage: nothing recorded for a while
+        elif roll < 0.012:
+            deltas.append(rng.uniform(0.01, 0.1))  # Restart: an extra refresh right after the last one
+        else:
+            deltas.append(rng.uniform(0.8, 1.25))
+    scale = (end - begin) / (sum(deltas) or 1)
+
+    timestamps = array.array('q', [begin])
+    position = float(begin)
+    for delta in deltas:
+        position += delta * scale
+        timestamps.append(max(timestamps[-1] + 1, int(position)))
+    return timestamps
+
+
+def _missing_mask(rng, count, platform):
+    """Indices at which a platform's fetch failed, as alternating run lengths"""
+    mean_failed, mean_ok = FAILURE_RUNS[platform]
+    mask = bytearray(count)
+    index = int(rng.expovariate(1 / mean_ok))
+    while index < count:
+        # Occasionally a scraper stays blocked for much longer
+        length = 1 + int(rng.expovariate(1 / (mean_failed * (20 if rng.random() < 0.02 else 1))))
+        mask[index:index + length] = b'\x01' * len(mask[index:index + length])
+        index += length + 1 + int(rng.expovariate(1 / mean_ok))
+    return mask
+
+
+def _growth_curve(rng, ages):
+    """Cumulative views: a saturating launch curve plus an occasional later viral bump"""
+    final = rng.lognormvariate(11, 1.2)
+    tau = rng.uniform(3, 30) * 86400
+    bump_at = rng.uniform(0, ages[-1] or 1) if rng.random() < 0.3 else None
+    bump = final * rng.uniform(0.2, 2)
+    bump_tau = rng.uniform(1, 5) * 86400
+    views = []
+    for age in ages:
+        value = final * (1 - math.exp(-age / tau))
+        if bump_at is not None and age > bump_at:
+            value += bump * (1 - math.exp(-(age - bump_at) / bump_tau))
+        views.append(int(value))
+    return views
+
+
+def make_realistic_history(total_points, videos, start=COLLECTION_START, end=None, seed=0, platforms=PLATFORMS):
+    """A history of about total_points points shaped like a long-running instance's.
+
+    All videos share one refresh timeline, as every video fetched by a
+    refresh gets that refresh's timestamp. Videos are added during the first
+    quarter of the window and join the timeline from then on. Each platform
+    may start late or never be tracked for a video, and fails in streaks;
+    missing platform values are stored as MISSING and left out of the totals,
+    just as refresh_data does.
+    """
+    rng = random.Random(seed)
+    end = int(end or time.time())
+    first_seen = {
+        video_id: start if index == 0 else start + int(rng.random() * (end - start) / 4)
+        for index, video_id in enumerate(videos)
+    }
+    tracked_seconds = sum(end - begin for begin in first_seen.values()) or 1
+    # Refreshes are spread about evenly, so a video tracked for a fraction of the window gets that fraction of them
+    timeline = _refresh_timeline(rng, start, end, max(1, round(total_points * (end - start) / tracked_seconds)))
+
+    history = History(videos)
+    for video_id in videos:
+        first = min(bisect_left(timeline, first_seen[video_id]), len(timeline) - 1)
+        series = history.get(video_id)
+        series.timestamps = timeline[first:]
+        count = len(series.timestamps)
+        released = series.timestamps[0] - int(rng.uniform(0, 30) * 86400)
+        ages = [timestamp - released for timestamp in series.timestamps]
+
+        platform_values = []
+        for platform in platforms:
+            roll = rng.random()
+            if roll < 0.1:
+                tracked_from = count  # Never tracked for this video
+            elif roll < 0.35:
+                tracked_from = int(count * rng.uniform(0.1, 0.6))  # Added later, e.g. Bluesky
+            else:
+                tracked_from = 0
+
+            views = _growth_curve(rng, ages)
+            like_rate = rng.uniform(0.02, 0.08)
+            comment_rate = rng.uniform(0.02, 0.1)
+            likes = [int(value * like_rate) for value in views]
+            comments = [int(value * comment_rate) for value in likes]
+
+            mask = _missing_mask(rng, count, platform)
+            mask[:tracked_from] = b'\x01' * tracked_from
+            views, likes, comments = (
+                [MISSING if failed else value for value, failed in zip(values, mask)]
+                for values in (views, likes, comments)
+            )
+            series.columns[f'views_{platform}'] = array.array('q', views)
+            series.columns[f'likes_{platform}'] = array.array('q', likes)
+            series.columns[f'comments_{platform}'] = array.array('q', comments)
+            platform_values.append((views, likes, comments))
+
+        for metric_index, metric in enumerate(['views', 'likes', 'comments']):
+            columns = [values[metric_index] for values in platform_values]
+            series.columns[f'total_{metric}'] = array.array(
+                'q', [sum(value for value in point if value != MISSING) for point in zip(*columns)]
+            )
+    return history
+
+
+def split_log(history, log_points):
+    """Remove the newest log_points points from history and return them as (video_id, entry) pairs in time order"""
+    entries = []
+    for video_id, series in history.items():
+        for index in range(len(series)):
+            entries.append((series.timestamps[index], video_id, index))
+    entries.sort()
+    tail = entries[len(entries) - log_points:] if log_points else []
+
+    log = [(video_id, history.get(video_id).point(index)) for _, video_id, index in tail]
+    cut = {}
+    for _, video_id, index in tail:
+        cut[video_id] = min(cut.get(video_id, index), index)
+    for video_id, index in cut.items():
+        series = history.get(video_id)
+        del series.timestamps[index:]
+        for column in series.columns.values():
+            del column[index:]
+    return log
+
+
+def write_history(history, path, log_points=0):
+    """Write history to path: legacy JSON for a .json path, otherwise a columnar base file plus log"""
+    if path.endswith('.json'):
+        with open(path, 'w') as f:
+            json.dump(history.to_legacy(), f)
+        return
+
+    log = split_log(history, log_points)
+    with open(path, 'wb') as f:
+        f.write(history.encode())
+    with open(path + '.log', 'wb') as f:
+        f.write(encode_log_records(log))
+
+
+def configured_videos():
+    """The VIDEOS keys from app.py, read without importing app and its Flask and storage setup"""
+    with open(os.path.join(ROOT, 'app.py')) as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(target, 'id', None) == 'VIDEOS' for target in node.targets):
+            return list(ast.literal_eval(node.value))
+    raise LookupError("VIDEOS not found in app.py")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a realistic synthetic engagement history")
+    parser.add_argument('--points', type=int, default=1000000, help="Total points across all videos")
+    parser.add_argument('--output', default='engagement_data.fgts', help="Columnar file, or a .json path for the legacy layout")
+    parser.add_argument('--log-points', type=int, default=0, help="Newest points to leave in the append log")
+    parser.add_argument('--start', type=int, default=COLLECTION_START, help="First timestamp (Unix seconds)")
+    parser.add_argument('--end', type=int, help="Last timestamp (Unix seconds), default now")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    history = make_realistic_history(args.points, configured_videos(), args.start, args.end, args.seed)
+    write_history(history, args.output, args.log_points)
+    print(f"Wrote {len(history)} points to {args.output} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
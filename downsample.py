@@ -0,0 +1,44 @@
+"""Largest-Triangle-Three-Buckets downsampling for the trend charts.
+
+LTTB keeps the first and last points and, from each of the remaining equal
+sized buckets, the point forming the largest triangle with the point kept
+from the previous bucket and the average of the next bucket. That preserves
+the visual shape of a line (launches, viral jumps, plateaus) far better than
+taking every n-th point.
+"""
+
+
+def lttb_indices(xs, ys, threshold):
+    """Indices of the points LTTB keeps from (xs, ys), in order. xs must be sorted."""
+    count = len(xs)
+    if threshold >= count:
+        return list(range(count))
+    if threshold <= 2:
+        return [0, count - 1][:threshold]
+
+    # Points 1 .. count - 2 are split into threshold - 2 buckets
+    every = (count - 2) / (threshold - 2)
+    indices = [0]
+    selected = 0
+    for bucket in range(threshold - 2):
+        # Average of the next bucket; the last bucket averages just the final point
+        next_start = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, count)
+        span = next_end - next_start
+        average_x = sum(xs[next_start:next_end]) / span
+        average_y = sum(ys[next_start:next_end]) / span
+
+        selected_x, selected_y = xs[selected], ys[selected]
+        largest_area = -1
+        for index in range(int(bucket * every) + 1, int((bucket + 1) * every) + 1):
+            area = abs(
+                (selected_x - average_x) * (ys[index] - selected_y)
+                - (selected_x - xs[index]) * (average_y - selected_y)
+            )
+            if area > largest_area:
+                largest_area = area
+                candidate = index
+        indices.append(candidate)
+        selected = candidate
+    indices.append(count - 1)
+    return indices
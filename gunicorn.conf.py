@@ -0,0 +1,10 @@
+"""gunicorn settings, read from the working directory; the command line in the Dockerfile sets the rest"""
+
+
+def post_fork(server, worker):
+    """Start the EMBEDDED_REFRESH thread in each worker, where it survives, rather than in a preloading master"""
+    from app import EMBEDDED_REFRESH, app, initialize_app
+
+    if EMBEDDED_REFRESH:
+        with app.app_context():
+            initialize_app()
@@ -0,0 +1,209 @@
+"""Per-platform fetch health: retries with backoff, and a circuit breaker.
+
+PlatformHealth tracks one platform. Timeouts, connection errors and 403, 429
+and 5xx responses count as failures. After failure_threshold failures in a
+row the circuit opens: requests to the platform fail at once with CircuitOpen
+for cooldown seconds, instead of each waiting out its timeout. After that a
+single trial request is let through. If it succeeds the circuit closes, if it
+fails the circuit opens for another cooldown.
+
+HealthSession is a requests.Session that sends every request to a known host
+through the health of its platform. GETs that hit 429 or 5xx are retried with
+exponential backoff and full jitter, or after the server's Retry-After. A
+Retry-After longer than max_delay opens the circuit until then.
+"""
+import email.utils
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BLOCKED_STATUSES = {403}
+
+FETCH_LATENCY = Histogram(
+    'fetch_request_duration_seconds', "Time of each request sent to a platform, by whether it failed",
+    ['platform', 'outcome']
+)
+FETCH_RETRIES = Counter('fetch_retries_total', "Requests sent again after a 429, 5xx or connection error", ['platform'])
+FETCH_SHORT_CIRCUITED = Counter(
+    'fetch_short_circuited_total', "Requests not sent because the platform's circuit was open", ['platform']
+)
+FETCH_BYTES = Counter(
+    'fetch_downloaded_bytes_total', "Response body bytes downloaded from a platform, not counting cache hits", ['platform']
+)
+CIRCUIT_OPEN = Gauge('fetch_circuit_open', "1 while the platform's circuit is open or half-open, else 0", ['platform'])
+
+
+class CircuitOpen(requests.RequestException):
+    """The platform's circuit is open, so the request was not sent"""
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delay-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class PlatformHealth:
+    """Circuit state and failure/latency counters of one platform"""
+
+    def __init__(self, platform, failure_threshold=5, cooldown=10 * 60, max_retries=2, base_delay=1.0, max_delay=30.0):
+        self.platform = platform
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.state = 'closed'  # closed, open or half_open
+        self.open_until = 0
+        self.trial_in_flight = False
+        self.consecutive_failures = 0
+        self.stats = {'requests': 0, 'failures': 0, 'retries': 0, 'short_circuited': 0, 'latency_seconds': 0.0}
+
+    def available(self):
+        """Whether a request would be let through right now; does not start a trial"""
+        with self.lock:
+            if self.state == 'open':
+                return time.time() >= self.open_until
+            return not (self.state == 'half_open' and self.trial_in_flight)
+
+    def before_request(self):
+        """Account for a request about to be sent, or raise CircuitOpen if it must not be"""
+        with self.lock:
+            if self.state == 'open' and time.time() >= self.open_until:
+                self.state = 'half_open'
+                logger.info(f"{self.platform} circuit half-open, sending a trial request")
+            if self.state == 'open' or (self.state == 'half_open' and self.trial_in_flight):
+                self.stats['short_circuited'] += 1
+                FETCH_SHORT_CIRCUITED.inc(platform=self.platform)
+                raise CircuitOpen(f"{self.platform} circuit is open for {max(0, self.open_until - time.time()):.0f}s")
+            if self.state == 'half_open':
+                self.trial_in_flight = True
+            self.stats['requests'] += 1
+
+    def record_success(self, latency):
+        FETCH_LATENCY.observe(latency, platform=self.platform, outcome='success')
+        with self.lock:
+            self.stats['latency_seconds'] += latency
+            self.consecutive_failures = 0
+            self.trial_in_flight = False
+            if self.state != 'closed':
+                logger.info(f"{self.platform} circuit closed")
+                self.state = 'closed'
+                CIRCUIT_OPEN.set(0, platform=self.platform)
+
+    def record_failure(self, latency, retry_after=None):
+        FETCH_LATENCY.observe(latency, platform=self.platform, outcome='failure')
+        with self.lock:
+            self.stats['latency_seconds'] += latency
+            self.stats['failures'] += 1
+            self.consecutive_failures += 1
+            self.trial_in_flight = False
+            throttled = retry_after is not None and retry_after > self.max_delay
+            if self.state == 'half_open' or self.consecutive_failures >= self.failure_threshold or throttled:
+                self.state = 'open'
+                CIRCUIT_OPEN.set(1, platform=self.platform)
+                self.open_until = max(self.open_until, time.time() + max(self.cooldown, retry_after or 0))
+                logger.warning(
+                    f"{self.platform} circuit open for {self.open_until - time.time():.0f}s "
+                    f"after {self.consecutive_failures} failures in a row"
+                )
+
+    def record_retry(self):
+        with self.lock:
+            self.stats['retries'] += 1
+        FETCH_RETRIES.inc(platform=self.platform)
+
+    def backoff(self, attempt, retry_after=None):
+        """Seconds to wait before retry number attempt + 1"""
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, func):
+        """Run func as one request to the platform: failures are any exception it raises"""
+        self.before_request()
+        started = time.monotonic()
+        try:
+            result = func()
+        except Exception:
+            self.record_failure(time.monotonic() - started)
+            raise
+        self.record_success(time.monotonic() - started)
+        return result
+
+    def snapshot(self):
+        with self.lock:
+            return {**self.stats, 'state': self.state, 'consecutive_failures': self.consecutive_failures}
+
+
+class HealthSession(requests.Session):
+    """Session whose requests to known platform hosts go through that platform's PlatformHealth"""
+
+    def __init__(self, platform_hosts, health):
+        super().__init__()
+        self.platform_hosts = platform_hosts  # Host suffix -> platform
+        self.health = health  # Platform -> PlatformHealth
+
+    def health_for(self, url):
+        host = urlsplit(url).hostname or ''
+        for suffix, platform in self.platform_hosts.items():
+            if host == suffix or host.endswith('.' + suffix):
+                return self.health.get(platform)
+        return None
+
+    def request(self, method, url, *args, **kwargs):
+        health = self.health_for(url)
+        if health is None:
+            return super().request(method, url, *args, **kwargs)
+
+        # Only GETs are safe to send again
+        attempts = health.max_retries + 1 if method.upper() == 'GET' else 1
+        for attempt in range(attempts):
+            if attempt:
+                health.record_retry()
+            health.before_request()
+            started = time.monotonic()
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                health.record_failure(time.monotonic() - started)
+                if attempt + 1 == attempts:
+                    raise
+                time.sleep(health.backoff(attempt))
+                continue
+
+            latency = time.monotonic() - started
+            if not getattr(response, 'from_cache', False):
+                FETCH_BYTES.inc(len(response.content), platform=health.platform)
+            if response.status_code in RETRY_STATUSES:
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                health.record_failure(latency, retry_after)
+                delay = health.backoff(attempt, retry_after)
+                if attempt + 1 == attempts or delay > health.max_delay:
+                    return response
+                logger.info(f"{health.platform} answered {response.status_code}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            if response.status_code in BLOCKED_STATUSES:
+                health.record_failure(latency)
+            else:
+                health.record_success(latency)
+            return response
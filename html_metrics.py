@@ -0,0 +1,186 @@
+"""Single-pass engagement metric extraction from scraped Threads/Instagram pages.
+
+The page is scanned once for <script> blobs. Blobs holding JSON (either a JSON
+script type or a `window.X = {...}` assignment) are parsed once and walked for
+every known metric key. Only if no JSON yields metrics do we fall back to the
+visible "1.2K likes" style text, and finally to a scan for large numbers.
+All patterns are compiled once at import time.
+"""
+import json
+import re
+
+SCRIPT_RE = re.compile(r'<script\b([^>]*)>(.*?)</script\s*>', re.DOTALL | re.IGNORECASE)
+JSON_TYPE_RE = re.compile(r'type\s*=\s*["\']application/(?:ld\+)?json["\']', re.IGNORECASE)
+ASSIGNMENT_RE = re.compile(r'^\s*(?:window\.[\w$.]+|var\s+[\w$]+)\s*=\s*', re.ASCII)
+CALL_RE = re.compile(r'^\s*window\.__additionalDataLoaded\([^,]*,\s*')
+TEXT_METRIC_RE = re.compile(
+    r'(\d+(?:,\d{3})*(?:\.\d+)?[KMB]?)\s*(views|likes|replies|comments)\b', re.IGNORECASE
+)
+NUMBER_RE = re.compile(r'\b(\d{3,})\b')
+
+# JSON key -> metric. Values may be a number, a numeric string or {"count": n}.
+METRIC_KEYS = {
+    'view_count': 'views',
+    'viewCount': 'views',
+    'video_view_count': 'views',
+    'videoViewCount': 'views',
+    'play_count': 'views',
+    'playCount': 'views',
+    'like_count': 'likes',
+    'likeCount': 'likes',
+    'edge_liked_by': 'likes',
+    'edge_media_preview_like': 'likes',
+    'reply_count': 'comments',
+    'direct_reply_count': 'comments',
+    'replyCount': 'comments',
+    'comment_count': 'comments',
+    'commentCount': 'comments',
+    'edge_media_to_comment': 'comments',
+}
+
+TEXT_METRICS = {'views': 'views', 'likes': 'likes', 'replies': 'comments', 'comments': 'comments'}
+
+_decoder = json.JSONDecoder()
+
+
+def parse_formatted_number(num_str):
+    """Parse numbers with thousands separators and K, M, B suffixes"""
+    try:
+        num_str = str(num_str).strip().upper().replace(',', '')
+        multiplier = {'K': 1000, 'M': 1000000, 'B': 1000000000}.get(num_str[-1:], 1)
+        if multiplier > 1:
+            num_str = num_str[:-1]
+        return int(float(num_str) * multiplier)
+    except (ValueError, IndexError):
+        return 0
+
+
+def _count(value):
+    if isinstance(value, dict):
+        value = value.get('count')
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return None
+
+
+def _interaction_statistics(stats):
+    """Metrics from a JSON-LD interactionStatistic list"""
+    metrics = {}
+    for stat in stats if isinstance(stats, list) else [stats]:
+        if not isinstance(stat, dict):
+            continue
+        interaction_type = str(stat.get('interactionType', ''))
+        count = _count(stat.get('userInteractionCount'))
+        if count is None:
+            continue
+        if 'LikeAction' in interaction_type:
+            metrics['likes'] = count
+        elif 'CommentAction' in interaction_type:
+            metrics['comments'] = count
+        elif 'WatchAction' in interaction_type or 'ViewAction' in interaction_type:
+            metrics['views'] = count
+    return metrics
+
+
+def _own_metrics(node):
+    """Metrics stored directly on one JSON object"""
+    metrics = {}
+    for key, value in node.items():
+        metric = METRIC_KEYS.get(key)
+        if metric and metric not in metrics:
+            count = _count(value)
+            if count is not None:
+                metrics[metric] = count
+    if 'interactionStatistic' in node:
+        metrics.update(_interaction_statistics(node['interactionStatistic']))
+    return metrics
+
+
+def find_metrics(obj):
+    """Walk parsed JSON and return the metrics of the first object that has any positive count"""
+    stack = [obj]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            metrics = _own_metrics(node)
+            if any(v > 0 for v in metrics.values()):
+                # Counts are sometimes split into a nested info object (e.g. Threads'
+                # text_post_app_info.direct_reply_count), so look one level down too
+                for child in node.values():
+                    if isinstance(child, dict):
+                        for metric, count in _own_metrics(child).items():
+                            metrics.setdefault(metric, count)
+                return metrics
+            children = node.values()
+        elif isinstance(node, list):
+            children = node
+        else:
+            continue
+        # Reversed so the walk visits children in document order
+        stack.extend(child for child in reversed(list(children)) if isinstance(child, (dict, list)))
+    return None
+
+
+def _parse_blob(attrs, body):
+    """Parse a script body as JSON if it is JSON or a JSON assignment, else None"""
+    if JSON_TYPE_RE.search(attrs):
+        start = 0
+    else:
+        match = ASSIGNMENT_RE.match(body) or CALL_RE.match(body)
+        if not match:
+            return None
+        start = match.end()
+    start = len(body) - len(body[start:].lstrip())
+    if start >= len(body) or body[start] not in '{[':
+        return None
+    try:
+        return _decoder.raw_decode(body, start)[0]
+    except ValueError:
+        return None
+
+
+def extract_json_metrics(html):
+    """Metrics from the first JSON script blob that contains any, or None"""
+    for attrs, body in SCRIPT_RE.findall(html):
+        data = _parse_blob(attrs, body)
+        if data is None:
+            continue
+        metrics = find_metrics(data)
+        if metrics:
+            return metrics
+    return None
+
+
+def extract_text_metrics(html):
+    """Largest "N views/likes/replies" figure of each kind found in the page text"""
+    metrics = {}
+    for number, label in TEXT_METRIC_RE.findall(html):
+        metric = TEXT_METRICS[label.lower()]
+        value = parse_formatted_number(number)
+        if value > 0:
+            metrics[metric] = max(metrics.get(metric, 0), value)
+    return metrics
+
+
+def extract_large_numbers(html, low, high):
+    """Last resort: every number of 3+ digits within [low, high], largest first"""
+    numbers = [int(n) for n in NUMBER_RE.findall(html)]
+    return sorted((n for n in numbers if low <= n <= high), reverse=True)
+
+
+def extract_metrics(html):
+    """Return (metrics, source) where source is 'json' or 'text'; (None, None) if nothing found"""
+    metrics = extract_json_metrics(html)
+    if metrics:
+        return metrics, 'json'
+
+    metrics = extract_text_metrics(html)
+    # Minimum threshold to avoid picking up stray small numbers
+    if metrics and any(v > 100 for v in metrics.values()):
+        return metrics, 'text'
+
+    return None, None
@@ -0,0 +1,271 @@
+"""A private HTTP cache for the scrapers, mounted as a requests transport adapter.
+
+Successful GET responses are kept in a directory with their validators
+(ETag, Last-Modified) and freshness lifetime (Cache-Control max-age, or
+Expires). A fresh entry is returned without touching the network. A stale one
+is revalidated with If-None-Match / If-Modified-Since, so an unchanged page
+costs a 304 instead of a full download. Requests sent with Cache-Control
+no-cache or max-age=0 (or Pragma: no-cache) always revalidate. Responses marked no-store, requests
+carrying credentials and responses with nothing to revalidate are never stored.
+
+The directory is a bounded LRU: once it holds more than max_bytes of bodies,
+the least recently used entries are deleted. Callers always see an ordinary
+200 response; those served from the cache have from_cache set.
+"""
+import email.utils
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from requests import Response
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# Describe the stored body as sent on the wire, not as it is kept (decoded, whole)
+DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+# Headers a 304 may carry that replace the stored ones
+UPDATED_HEADERS = ('cache-control', 'date', 'etag', 'expires', 'last-modified', 'vary')
+
+CACHE_RESPONSES = Counter(
+    'http_cache_responses_total', "Cacheable GETs by outcome: fresh (no request), revalidated (304) or miss", ['outcome']
+)
+CACHE_BYTES = Gauge('http_cache_bytes', "Bytes of entries in the HTTP cache directory")
+
+
+def _cache_control(headers):
+    """Cache-Control directives as a dict; valueless directives map to None"""
+    directives = {}
+    for part in headers.get('Cache-Control', '').split(','):
+        name, _, value = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+    return directives
+
+
+def _http_date(value):
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness_lifetime(headers):
+    """Seconds a response may be reused without revalidation, counted from when it was received"""
+    directives = _cache_control(headers)
+    if 'no-cache' in directives:
+        return 0
+    try:
+        age = int(headers.get('Age', 0))
+    except ValueError:
+        age = 0
+    if directives.get('max-age') is not None:
+        try:
+            return max(0, int(directives['max-age']) - age)
+        except ValueError:
+            return 0
+    expires, date = _http_date(headers.get('Expires')), _http_date(headers.get('Date'))
+    if expires is not None:
+        return max(0, expires - (date or time.time()) - age)
+    return 0
+
+
+class CachingAdapter(HTTPAdapter):
+    """HTTPAdapter that answers GETs from, and revalidates against, an on-disk LRU cache"""
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> file size, least recently used first
+        self.total_bytes = 0
+        self.stats = {'fresh': 0, 'revalidated': 0, 'miss': 0}
+        self.scanned = False  # The directory is only touched on the first request
+
+    def _scan(self):
+        """Index entries left by a previous process, oldest access first; caller holds the lock"""
+        self.scanned = True
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            names = os.listdir(self.directory)
+        except OSError as e:
+            logger.warning(f"HTTP cache directory {self.directory} is unusable: {e}")
+            return
+        found = []
+        for name in names:
+            if not re.fullmatch(r'[0-9a-f]{32}', name):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            found.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(found):
+            self.entries[name] = size
+            self.total_bytes += size
+        self._evict()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    @staticmethod
+    def _key(request):
+        return hashlib.sha256(f"{request.method} {request.url}".encode('utf-8')).hexdigest()[:32]
+
+    def _load(self, key):
+        """(meta, body) of an entry, or None if it is gone or unreadable"""
+        with self.lock:
+            if not self.scanned:
+                self._scan()
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+        try:
+            with open(self._path(key), 'rb') as f:
+                meta, _, body = f.read().partition(b'\n')
+            os.utime(self._path(key))
+            meta = json.loads(meta)
+        except (OSError, ValueError):
+            self._remove(key)
+            return None
+        meta['headers'] = CaseInsensitiveDict(meta['headers'])
+        return meta, body
+
+    def _store(self, key, meta, body):
+        data = json.dumps({**meta, 'headers': dict(meta['headers'])}).encode('utf-8') + b'\n' + body
+        if len(data) > self.max_bytes:
+            return
+        tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logger.warning(f"Could not write HTTP cache entry: {e}")
+            return
+        with self.lock:
+            self.total_bytes += len(data) - self.entries.pop(key, 0)
+            self.entries[key] = len(data)
+            self._evict()
+
+    def _remove(self, key):
+        with self.lock:
+            self.total_bytes -= self.entries.pop(key, 0)
+            CACHE_BYTES.set(self.total_bytes)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _count(self, outcome):
+        with self.lock:
+            self.stats[outcome] += 1
+        CACHE_RESPONSES.inc(outcome=outcome)
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits; caller holds the lock"""
+        while self.total_bytes > self.max_bytes and self.entries:
+            key, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+        CACHE_BYTES.set(self.total_bytes)
+
+    @staticmethod
+    def _must_revalidate(request):
+        """Whether the request asks for stored responses to be confirmed by the origin, fresh or not"""
+        directives = _cache_control(request.headers)
+        if 'no-cache' in directives or 'no-cache' in request.headers.get('Pragma', '').lower():
+            return True
+        try:
+            return directives.get('max-age') is not None and int(directives['max-age']) <= 0
+        except ValueError:
+            return True
+
+    @staticmethod
+    def _vary_matches(meta, request):
+        return all(request.headers.get(name) == value for name, value in meta.get('vary', {}).items())
+
+    @staticmethod
+    def _cached_response(request, meta, body):
+        response = Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict(meta['headers'])
+        response._content = body
+        response.url = request.url
+        response.request = request
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.elapsed = timedelta(0)
+        response.from_cache = True
+        return response
+
+    def _meta(self, request, response):
+        """What to store alongside a 200 body, or None if the response must not be stored"""
+        directives = _cache_control(response.headers)
+        vary = [name.strip() for name in response.headers.get('Vary', '').split(',') if name.strip()]
+        if 'no-store' in directives or '*' in vary:
+            return None
+        lifetime = freshness_lifetime(response.headers)
+        if not lifetime and 'ETag' not in response.headers and 'Last-Modified' not in response.headers:
+            return None  # Could neither be reused nor revalidated
+        return {
+            'headers': {
+                name: value for name, value in response.headers.items() if name.lower() not in DROPPED_HEADERS
+            },
+            'expires_at': time.time() + lifetime,
+            'vary': {name: request.headers.get(name) for name in vary},
+        }
+
+    def send(self, request, stream=False, **kwargs):
+        # Only plain GETs are shared; anything carrying credentials goes straight through
+        if request.method != 'GET' or stream or 'Authorization' in request.headers:
+            return super().send(request, stream=stream, **kwargs)
+
+        key = self._key(request)
+        cached = self._load(key)
+        if cached is not None and not self._vary_matches(cached[0], request):
+            cached = None
+        if cached is not None:
+            meta, body = cached
+            if time.time() < meta['expires_at'] and not self._must_revalidate(request):
+                self._count('fresh')
+                return self._cached_response(request, meta, body)
+            if 'ETag' in meta['headers']:
+                request.headers['If-None-Match'] = meta['headers']['ETag']
+            if 'Last-Modified' in meta['headers']:
+                request.headers['If-Modified-Since'] = meta['headers']['Last-Modified']
+
+        response = super().send(request, stream=stream, **kwargs)
+
+        if response.status_code == 304 and cached is not None:
+            meta, body = cached
+            for name in UPDATED_HEADERS:
+                if name in response.headers:
+                    meta['headers'][name] = response.headers[name]
+            meta['expires_at'] = time.time() + freshness_lifetime(meta['headers'])
+            self._store(key, meta, body)
+            self._count('revalidated')
+            return self._cached_response(request, meta, body)
+
+        self._count('miss')
+        if response.status_code == 200:
+            meta = self._meta(request, response)
+            if meta is not None:
+                self._store(key, meta, response.content)
+        elif cached is not None and response.status_code < 500:
+            self._remove(key)
+        return response
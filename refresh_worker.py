@@ -0,0 +1,49 @@
+"""Refresh the engagement history outside the web server.
+
+The web processes only read the history from storage; this worker fetches new
+social data and writes it. Run it as a Cloud Run Job or cron entry, or as a
+long-lived process:
+
+    python refresh_worker.py --once          # fetch the video/platform pairs that are due, then exit
+    python refresh_worker.py --interval 60   # check every 60 seconds until stopped
+    python refresh_worker.py --once --force  # fetch every pair now, whatever the schedule says
+    python refresh_worker.py --metrics-port 9100  # also serve Prometheus metrics of the fetches
+
+Several workers can run at once: the refresh lease lets only one of them write.
+"""
+import argparse
+import time
+
+from app import REFRESH_MAX_INTERVAL, REFRESH_MIN_INTERVAL, app, data_manager, refresh_if_stale
+from metrics import start_http_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch new social data into the engagement history")
+    parser.add_argument('--once', action='store_true', help="Refresh if stale and exit instead of looping")
+    parser.add_argument('--interval', type=int, default=60, help="Seconds between staleness checks when looping")
+    parser.add_argument('--force', action='store_true', help="Fetch every video/platform pair on the first run")
+    parser.add_argument('--metrics-port', type=int, help="Serve Prometheus metrics on this port")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+
+    data_manager.load_data()
+    app.logger.info(f"Each video/platform pair refreshed every {REFRESH_MIN_INTERVAL} to {REFRESH_MAX_INTERVAL} seconds")
+    refresh = (lambda: data_manager.refresh_data(force=True)) if args.force else refresh_if_stale
+    if args.once:
+        # Errors end the run with a non-zero exit, so the job scheduler sees the failure
+        refresh()
+        return
+    while True:
+        try:
+            refresh()
+        except Exception as e:
+            app.logger.error(f"Refresh failed, retrying in {args.interval} seconds: {e}")
+        refresh = refresh_if_stale
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
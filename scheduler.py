@@ -0,0 +1,94 @@
+"""When to fetch each (video, platform) pair next.
+
+Every pair is polled on its own interval, derived from how fast its
+engagement is growing: a pair is due again once it is expected to have grown
+by change_target of its current value, clamped to [min_interval,
+max_interval]. A young TikTok that gains thousands of views an hour is polled
+every min_interval, a weeks-old Tumblr post that barely moves only every
+max_interval. Pairs without a growth estimate yet use default_interval.
+
+Due times are kept in a heap, so asking whether anything is due is O(1). The
+per-pair state (last fetch time, last metrics, smoothed growth rate) is
+serialized to JSON, so a fresh refresh worker carries on where the last one
+stopped.
+"""
+import heapq
+import json
+
+
+class RefreshScheduler:
+    """Growth estimates and due times of every (video, platform) pair"""
+
+    def __init__(self, default_interval, min_interval, max_interval, change_target, smoothing=0.5):
+        self.default_interval = default_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.change_target = change_target
+        self.smoothing = smoothing  # Weight of the newest growth measurement in the rate estimate
+        self.pairs = {}  # (video_id, platform) -> state dict
+        self.heap = []  # (due_at, video_id, platform); entries whose due_at is outdated are skipped lazily
+
+    def _push(self, pair, due_at):
+        self.pairs[pair]['due_at'] = due_at
+        heapq.heappush(self.heap, (due_at, *pair))
+
+    def add(self, pair, fetched_at=None, metrics=None, rate=None):
+        """Start tracking a pair, optionally with what is already known about it; due at once if never fetched"""
+        if pair in self.pairs:
+            return
+        self.pairs[pair] = {'fetched_at': fetched_at, 'metrics': metrics, 'rate': rate, 'due_at': None}
+        self._push(pair, fetched_at + self.interval(pair) if fetched_at is not None else 0)
+
+    def interval(self, pair):
+        """Seconds between fetches of a pair at its current growth rate"""
+        state = self.pairs[pair]
+        if state['rate'] is None or not state['metrics']:
+            return self.default_interval
+        if state['rate'] <= 0:
+            return self.max_interval
+        interval = self.change_target * max(sum(state['metrics']), 1) / state['rate']
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def next_due(self):
+        """Time at which the earliest pair is due, or None if nothing is tracked"""
+        while self.heap:
+            due_at, *pair = self.heap[0]
+            state = self.pairs.get(tuple(pair))
+            if state is not None and state['due_at'] == due_at:
+                return due_at
+            heapq.heappop(self.heap)
+        return None
+
+    def due(self, now):
+        """Pairs due at `now`, earliest first"""
+        return sorted((pair for pair, state in self.pairs.items() if state['due_at'] <= now),
+                      key=lambda pair: self.pairs[pair]['due_at'])
+
+    def record(self, pair, fetched_at, metrics):
+        """A successful fetch: update the growth rate from the previous fetch and schedule the next one"""
+        state = self.pairs[pair]
+        if state['fetched_at'] is not None and state['metrics'] and fetched_at > state['fetched_at']:
+            rate = max(0, sum(metrics) - sum(state['metrics'])) / (fetched_at - state['fetched_at'])
+            state['rate'] = rate if state['rate'] is None else (
+                self.smoothing * rate + (1 - self.smoothing) * state['rate']
+            )
+        state['fetched_at'] = fetched_at
+        state['metrics'] = list(metrics)
+        self._push(pair, fetched_at + self.interval(pair))
+
+    def record_failure(self, pair, now):
+        """A failed fetch keeps the last good state and is retried after min_interval"""
+        self._push(pair, now + self.min_interval)
+
+    def encode(self):
+        return json.dumps([
+            {'video': video_id, 'platform': platform, **state} for (video_id, platform), state in self.pairs.items()
+        ]).encode('utf-8')
+
+    def load(self, raw, pairs):
+        """Take over the encoded state of the given pairs; records of pairs no longer tracked are dropped"""
+        for record in json.loads(raw):
+            pair = (record['video'], record['platform'])
+            if pair in pairs:
+                self.pairs[pair] = {key: record.get(key) for key in ('fetched_at', 'metrics', 'rate')}
+                self._push(pair, record.get('due_at') or 0)
@@ -1,17 +1,206 @@
 import requests
 import re
+import base64
 import time
 import json
 import random
 import os
 import logging
-from googleapiclient.discovery import build
+import tempfile
+import threading
+from health import HealthSession, PlatformHealth
+from html_metrics import extract_large_numbers, extract_metrics, find_metrics
+from http_cache import CachingAdapter
+from metrics import Counter
 
 logger = logging.getLogger(__name__)
 
+# Unchanged pages are revalidated instead of downloaded again; set HTTP_CACHE_DIR to an empty string to disable
+HTTP_CACHE_DIR = os.environ.get('HTTP_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'fools-gold-http-cache'))
+HTTP_CACHE_MAX_BYTES = int(os.environ.get('HTTP_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+# Minimum/maximum delay in seconds between two requests to the same platform.
+# Scraped platforms are paced to avoid getting blocked; API platforms only need
+# a small courtesy gap.
+PLATFORM_DELAYS = {
+    'threads': (2, 5),
+    'instagram': (2, 5),
+    'tiktok': (2, 5),
+    'youtube': (0, 0),
+    'tumblr': (0.2, 0.5),
+    'bluesky': (0.2, 0.5),
+}
+DEFAULT_DELAY = (2, 5)
+
+# Requests to these hosts (and their subdomains) are tracked per platform for retries and the circuit breaker
+PLATFORM_HOSTS = {
+    'threads.com': 'threads',
+    'threads.net': 'threads',
+    'instagram.com': 'instagram',
+    'tiktok.com': 'tiktok',
+    'tumblr.com': 'tumblr',
+    'bsky.social': 'bluesky',
+    'bsky.app': 'bluesky',
+}
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', 5))  # Failures in a row before a platform is skipped
+CIRCUIT_COOLDOWN = int(os.environ.get('CIRCUIT_COOLDOWN', 10 * 60))  # Seconds a failing platform is skipped before a trial request
+FETCH_MAX_RETRIES = int(os.environ.get('FETCH_MAX_RETRIES', 2))  # Retries of a GET answered with 429 or 5xx
+FETCH_MAX_BACKOFF = float(os.environ.get('FETCH_MAX_BACKOFF', 30))  # Longest wait before a retry; a longer Retry-After opens the circuit
+
+FETCH_RESULTS = Counter('fetch_results_total', "URLs fetched, by whether metrics came back", ['platform', 'outcome'])
+FETCH_ESTIMATED = Counter(
+    'fetch_estimated_total', "Fetches whose missing likes, comments or views were estimated from the others", ['platform']
+)
+RATE_LIMIT_SLEEP = Counter(
+    'fetch_rate_limit_sleep_seconds_total', "Seconds spent waiting between requests to the same platform", ['platform']
+)
+
+# Enhanced headers to better mimic a real browser when scraping Threads and Instagram
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Sec-Ch-Ua': '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
+    'Sec-Ch-Ua-Mobile': '?0',
+    'Sec-Ch-Ua-Platform': '"macOS"',
+    'Cache-Control': 'no-cache',
+    'Pragma': 'no-cache'
+}
+
+# videos().list accepts up to 50 comma-separated IDs per request
+YOUTUBE_MAX_IDS = 50
+
+TUMBLR_API = 'https://api.tumblr.com/v2'
+# /posts returns at most 20 posts per page
+TUMBLR_PAGE_SIZE = 20
+TUMBLR_MAX_PAGES = 5
+
+BLUESKY_API = 'https://bsky.social/xrpc'
+# app.bsky.feed.getPosts accepts up to 25 URIs per request
+BLUESKY_MAX_URIS = 25
+# Refresh the access token when it has less than this many seconds left
+BLUESKY_TOKEN_MARGIN = 60
+
+
+class BlueskyClient:
+    """Logged-in Bluesky session that refreshes its tokens and caches handle -> DID"""
+    
+    def __init__(self, session, identifier, password, rate_limit=None):
+        self.session = session
+        self.identifier = identifier
+        self.password = password
+        self.rate_limit = rate_limit or (lambda: None)
+        self.access_jwt = None
+        self.refresh_jwt = None
+        self.access_expires = 0
+        self.dids = {}
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def _jwt_expiry(token):
+        """Read the exp claim of a JWT without verifying it"""
+        try:
+            payload = token.split('.')[1]
+            payload += '=' * (-len(payload) % 4)
+            return int(json.loads(base64.urlsafe_b64decode(payload))['exp'])
+        except (IndexError, KeyError, ValueError, TypeError):
+            # Unknown format: assume the short default access token lifetime
+            return int(time.time()) + 5 * 60
+    
+    def _store_tokens(self, session_info):
+        self.access_jwt = session_info['accessJwt']
+        self.refresh_jwt = session_info['refreshJwt']
+        self.access_expires = self._jwt_expiry(self.access_jwt)
+    
+    def _create_session(self):
+        self.rate_limit()
+        response = self.session.post(
+            f"{BLUESKY_API}/com.atproto.server.createSession",
+            json={"identifier": self.identifier, "password": self.password},
+            timeout=15
+        )
+        response.raise_for_status()
+        self._store_tokens(response.json())
+        logger.info("Created new Bluesky session")
+    
+    def _refresh_session(self):
+        self.rate_limit()
+        response = self.session.post(
+            f"{BLUESKY_API}/com.atproto.server.refreshSession",
+            headers={"Authorization": f"Bearer {self.refresh_jwt}"},
+            timeout=15
+        )
+        response.raise_for_status()
+        self._store_tokens(response.json())
+        logger.info("Refreshed Bluesky session")
+    
+    def _ensure_session(self, force=False):
+        with self.lock:
+            if not force and self.access_jwt and time.time() < self.access_expires - BLUESKY_TOKEN_MARGIN:
+                return
+            
+            if self.refresh_jwt and self._jwt_expiry(self.refresh_jwt) > time.time() + BLUESKY_TOKEN_MARGIN:
+                try:
+                    self._refresh_session()
+                    return
+                except requests.RequestException as e:
+                    logger.warning(f"Bluesky session refresh failed, logging in again: {e}")
+            
+            self._create_session()
+    
+    def _get(self, method, params):
+        """Authenticated XRPC GET that retries once with fresh tokens on expiry"""
+        for attempt in range(2):
+            self._ensure_session(force=attempt > 0)
+            self.rate_limit()
+            response = self.session.get(
+                f"{BLUESKY_API}/{method}",
+                params=params,
+                headers={"Authorization": f"Bearer {self.access_jwt}"},
+                timeout=15
+            )
+            if response.status_code in (400, 401) and attempt == 0:
+                try:
+                    error = response.json().get('error')
+                except ValueError:
+                    error = None
+                if error in ('ExpiredToken', 'InvalidToken') or response.status_code == 401:
+                    continue
+            response.raise_for_status()
+            return response.json()
+    
+    def resolve_handle(self, handle):
+        if handle.startswith('did:'):
+            return handle
+        if handle not in self.dids:
+            self.dids[handle] = self._get("com.atproto.identity.resolveHandle", {"handle": handle})['did']
+        return self.dids[handle]
+    
+    def get_posts(self, uris):
+        """Return a dict of post URI -> post view, fetching 25 URIs per request"""
+        posts = {}
+        for start in range(0, len(uris), BLUESKY_MAX_URIS):
+            chunk = uris[start:start + BLUESKY_MAX_URIS]
+            data = self._get("app.bsky.feed.getPosts", {"uris": chunk})
+            for post in data.get('posts', []):
+                posts[post['uri']] = post
+        return posts
+
+
 class SocialMediaFetcher:
     def __init__(self):
-        self.session = requests.Session()
+        self.health = {
+            platform: PlatformHealth(
+                platform, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, cooldown=CIRCUIT_COOLDOWN,
+                max_retries=FETCH_MAX_RETRIES, max_delay=FETCH_MAX_BACKOFF
+            )
+            for platform in PLATFORM_DELAYS
+        }
+        self.session = HealthSession(PLATFORM_HOSTS, self.health)
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -21,300 +210,130 @@ class SocialMediaFetcher:
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         })
-        self.last_request_time = 0
+        self.http_cache = None
+        if HTTP_CACHE_DIR:
+            self.http_cache = CachingAdapter(HTTP_CACHE_DIR, max_bytes=HTTP_CACHE_MAX_BYTES)
+            self.session.mount('http://', self.http_cache)
+            self.session.mount('https://', self.http_cache)
+        self.last_request_time = {}
+        self._rate_lock = threading.Lock()
+        self._youtube = None
+        self._youtube_lock = threading.Lock()
+        self._bluesky = None
+        self._bluesky_lock = threading.Lock()
+        self._tumblr_timestamps = {}
     
-    def fetch_youtube_data(self, url):
+    def _get_youtube_client(self):
+        """Build the YouTube API client once and reuse it for every request"""
+        with self._youtube_lock:
+            if self._youtube is None:
+                api_key = os.environ.get('YOUTUBE_API_KEY')
+                if not api_key:
+                    return None
+                # Imported here so web processes, which never fetch, do not pay for it
+                from googleapiclient.discovery import build
+                self._youtube = build('youtube', 'v3', developerKey=api_key, cache_discovery=False)
+            return self._youtube
+    
+    def fetch_youtube_batch(self, urls):
+        """Fetch statistics for many YouTube videos with one videos().list call per 50 IDs"""
+        # Extract video IDs from URLs
+        video_ids = {url: url.rstrip('/').split('/')[-1] for url in urls}
+        results = {}
+        
         try:
-            # Extract video ID from URL
-            video_id = url.split('/')[-1]
-            
-            # Get YouTube API key from environment
-            api_key = os.environ.get('YOUTUBE_API_KEY')
-            if not api_key:
-                logger.warning("YOUTUBE_API_KEY not found in environment, using fallback data")
-                return self._get_fallback_data()
-            
-            # Build YouTube API client
-            youtube = build('youtube', 'v3', developerKey=api_key)
-            
-            # Get video statistics
-            response = youtube.videos().list(
-                part='statistics',
-                id=video_id
-            ).execute()
-            
-            if not response['items']:
-                logger.warning(f"No video found for ID {video_id}")
-                return self._get_fallback_data()
-            
-            stats = response['items'][0]['statistics']
-            
-            views = int(stats.get('viewCount', 0))
-            likes = int(stats.get('likeCount', 0))
-            comments = int(stats.get('commentCount', 0))
-            
-            logger.info(f"Successfully fetched YouTube data for {video_id}: views={views}, likes={likes}, comments={comments}")
+            youtube = self._get_youtube_client()
+            if youtube is None:
+                logger.warning("YOUTUBE_API_KEY not found in environment, skipping YouTube")
+                return {}
+            
+            unique_ids = list(dict.fromkeys(video_ids.values()))
+            stats_by_id = {}
+            for start in range(0, len(unique_ids), YOUTUBE_MAX_IDS):
+                chunk = unique_ids[start:start + YOUTUBE_MAX_IDS]
+                self._rate_limit('youtube')
+                request = youtube.videos().list(
+                    part='statistics',
+                    id=','.join(chunk),
+                    maxResults=len(chunk)
+                )
+                # googleapiclient retries 429 and 5xx itself; the health tracks the outcome
+                response = self.health['youtube'].call(lambda: request.execute(num_retries=FETCH_MAX_RETRIES))
+                for item in response.get('items', []):
+                    stats_by_id[item['id']] = item['statistics']
+            
+            for url, video_id in video_ids.items():
+                stats = stats_by_id.get(video_id)
+                if stats is None:
+                    logger.warning(f"No video found for ID {video_id}")
+                    continue
+                
+                views = int(stats.get('viewCount', 0))
+                likes = int(stats.get('likeCount', 0))
+                comments = int(stats.get('commentCount', 0))
+                
+                logger.info(f"Successfully fetched YouTube data for {video_id}: views={views}, likes={likes}, comments={comments}")
+                results[url] = {
+                    'views': views,
+                    'likes': likes,
+                    'comments': comments
+                }
             
-            return {
-                'views': views,
-                'likes': likes,
-                'comments': comments
-            }
+            return results
             
         except Exception as e:
-            logger.error(f"Error fetching YouTube data for {url}: {e}")
-            return self._get_fallback_data()
+            logger.error(f"Error fetching YouTube data for {len(urls)} videos: {e}")
+            return results
+    
+    def fetch_youtube_data(self, url):
+        return self.fetch_youtube_batch([url]).get(url)
     
     def fetch_instagram_data(self, url):
         try:
-            # Enhanced headers to better mimic real browser (similar to Threads approach)
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.9',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'none',
-                'Sec-Ch-Ua': '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
-                'Sec-Ch-Ua-Mobile': '?0',
-                'Sec-Ch-Ua-Platform': '"macOS"',
-                'Cache-Control': 'no-cache',
-                'Pragma': 'no-cache'
-            }
-            
             # Strategy 1: Try embed endpoint with enhanced headers
             embed_url = url + "embed/?__a=1"
-            response = self.session.get(embed_url, headers=headers, timeout=15)
+            response = self.session.get(embed_url, headers=BROWSER_HEADERS, timeout=15)
             
             if response.status_code == 200:
                 try:
-                    data = response.json()
-                    # Try to find engagement metrics in the JSON response
-                    def find_metrics(obj):
-                        if isinstance(obj, dict):
-                            metrics = {}
-                            # Look for various metric field names
-                            metric_fields = {
-                                'likes': ['like_count', 'likeCount', 'likes', 'edge_liked_by'],
-                                'comments': ['comment_count', 'commentCount', 'comments', 'edge_media_to_comment'],
-                                'views': ['video_view_count', 'videoViewCount', 'play_count', 'playCount', 'view_count', 'viewCount']
-                            }
-                            
-                            for metric_type, field_names in metric_fields.items():
-                                for field in field_names:
-                                    if field in obj:
-                                        value = obj[field]
-                                        # Handle nested count objects
-                                        if isinstance(value, dict) and 'count' in value:
-                                            value = value['count']
-                                        if isinstance(value, (int, str)) and str(value).isdigit():
-                                            metrics[metric_type] = int(value)
-                                            break
-                            
-                            if metrics and any(v > 0 for v in metrics.values()):
-                                return metrics
-                            
-                            # Recurse into nested objects
-                            for value in obj.values():
-                                if isinstance(value, (dict, list)):
-                                    result = find_metrics(value)
-                                    if result:
-                                        return result
-                        
-                        elif isinstance(obj, list):
-                            for item in obj:
-                                result = find_metrics(item)
-                                if result:
-                                    return result
-                        
-                        return None
-                    
-                    metrics = find_metrics(data)
+                    metrics = find_metrics(response.json())
                     if metrics:
                         logger.info(f"Successfully extracted Instagram metrics from embed JSON: {metrics}")
                         return self._validate_and_complete_metrics(metrics.get('views', 0), metrics.get('likes', 0), metrics.get('comments', 0), 'instagram')
-                
                 except json.JSONDecodeError:
                     pass
             
             # Strategy 2: Try regular page with enhanced headers
-            response = self.session.get(url, headers=headers, timeout=15)
+            response = self.session.get(url, headers=BROWSER_HEADERS, timeout=15)
             response.raise_for_status()
             html = response.text
             logger.debug(f"Instagram response status: {response.status_code}, content length: {len(html)}")
             
-            # Strategy 3: Look for JSON data in script tags
-            json_patterns = [
-                r'window\._sharedData\s*=\s*({.*?});',
-                r'window\.__additionalDataLoaded\([^,]*,\s*({.*?})\)',
-                r'"edge_media_to_comment":\s*{\s*"count":\s*(\d+)',
-                r'"edge_liked_by":\s*{\s*"count":\s*(\d+)',
-                r'"video_view_count":\s*(\d+)',
-            ]
-            
-            for pattern in json_patterns:
-                matches = re.findall(pattern, html, re.DOTALL | re.IGNORECASE)
-                for match in matches:
-                    try:
-                        if pattern.endswith('(\\d+)'):
-                            # Direct number extraction
-                            if 'comment' in pattern:
-                                comments = int(match)
-                                if comments > 0:
-                                    logger.info(f"Found Instagram comments from JSON: {comments}")
-                                    return self._validate_and_complete_metrics(0, 0, comments, 'instagram')
-                            elif 'liked_by' in pattern:
-                                likes = int(match)
-                                if likes > 0:
-                                    logger.info(f"Found Instagram likes from JSON: {likes}")
-                                    return self._validate_and_complete_metrics(0, likes, 0, 'instagram')
-                            elif 'video_view' in pattern:
-                                views = int(match)
-                                if views > 0:
-                                    logger.info(f"Found Instagram views from JSON: {views}")
-                                    return self._validate_and_complete_metrics(views, 0, 0, 'instagram')
-                        else:
-                            # JSON object extraction
-                            data = json.loads(match)
-                            def extract_from_shared_data(obj):
-                                if isinstance(obj, dict):
-                                    # Look for post data
-                                    if 'entry_data' in obj and 'PostPage' in obj['entry_data']:
-                                        post_data = obj['entry_data']['PostPage'][0]['graphql']['shortcode_media']
-                                        metrics = {}
-                                        
-                                        if 'edge_liked_by' in post_data:
-                                            metrics['likes'] = post_data['edge_liked_by']['count']
-                                        if 'edge_media_to_comment' in post_data:
-                                            metrics['comments'] = post_data['edge_media_to_comment']['count']
-                                        if 'video_view_count' in post_data:
-                                            metrics['views'] = post_data['video_view_count']
-                                        
-                                        if metrics:
-                                            return metrics
-                                    
-                                    # Recursive search
-                                    for value in obj.values():
-                                        if isinstance(value, (dict, list)):
-                                            result = extract_from_shared_data(value)
-                                            if result:
-                                                return result
-                                elif isinstance(obj, list):
-                                    for item in obj:
-                                        result = extract_from_shared_data(item)
-                                        if result:
-                                            return result
-                                return None
-                            
-                            metrics = extract_from_shared_data(data)
-                            if metrics:
-                                logger.info(f"Extracted Instagram data from shared data: {metrics}")
-                                return self._validate_and_complete_metrics(metrics.get('views', 0), metrics.get('likes', 0), metrics.get('comments', 0), 'instagram')
-                            
-                    except (json.JSONDecodeError, ValueError, KeyError, IndexError):
-                        continue
-            
-            # Strategy 4: Look for JSON-LD structured data
-            jsonld_pattern = r'<script type="application/ld\+json">(.*?)</script>'
-            jsonld_matches = re.findall(jsonld_pattern, html, re.DOTALL)
-            
-            for match in jsonld_matches:
-                try:
-                    data = json.loads(match)
-                    if 'interactionStatistic' in data:
-                        stats = data['interactionStatistic']
-                        metrics = {}
-                        
-                        for stat in stats:
-                            interaction_type = stat.get('interactionType', '')
-                            count = stat.get('userInteractionCount', 0)
-                            
-                            if 'LikeAction' in interaction_type:
-                                metrics['likes'] = count
-                            elif 'CommentAction' in interaction_type:
-                                metrics['comments'] = count
-                            elif 'WatchAction' in interaction_type or 'ViewAction' in interaction_type:
-                                metrics['views'] = count
-                        
-                        if metrics and any(v > 0 for v in metrics.values()):
-                            logger.info(f"Successfully extracted Instagram metrics from JSON-LD: {metrics}")
-                            return self._validate_and_complete_metrics(metrics.get('views', 0), metrics.get('likes', 0), metrics.get('comments', 0), 'instagram')
-                            
-                except json.JSONDecodeError:
-                    pass
-            
-            # Strategy 5: Enhanced pattern matching with formatted numbers
-            enhanced_patterns = [
-                # Views patterns
-                (r'"video_view_count"[:\s]*(\d+)', 'views'),
-                (r'"view_count"[:\s]*(\d+)', 'views'),
-                (r'(\d+(?:,\d+)*)\s*views', 'views'),
-                (r'(\d+(?:\.\d+)?[KMB])\s*views', 'views_formatted'),
-                
-                # Likes patterns
-                (r'"edge_liked_by"[:\s]*{[^}]*"count"[:\s]*(\d+)', 'likes'),
-                (r'"like_count"[:\s]*(\d+)', 'likes'),
-                (r'(\d+(?:,\d+)*)\s*likes', 'likes'),
-                (r'(\d+(?:\.\d+)?[KMB])\s*likes', 'likes_formatted'),
-                
-                # Comments patterns
-                (r'"edge_media_to_comment"[:\s]*{[^}]*"count"[:\s]*(\d+)', 'comments'),
-                (r'"comment_count"[:\s]*(\d+)', 'comments'),
-                (r'(\d+(?:,\d+)*)\s*comments', 'comments'),
-                (r'(\d+(?:\.\d+)?[KMB])\s*comments', 'comments_formatted'),
-            ]
-            
-            metrics = {}
-            for pattern, metric_type in enhanced_patterns:
-                matches = re.findall(pattern, html, re.IGNORECASE)
-                if matches:
-                    for match in matches:
-                        try:
-                            if metric_type.endswith('_formatted'):
-                                # Handle K, M, B suffixes
-                                base_type = metric_type.replace('_formatted', '')
-                                value = self._parse_formatted_number(match)
-                                if value > 0:
-                                    metrics[base_type] = max(metrics.get(base_type, 0), value)
-                            else:
-                                # Regular numbers
-                                value = int(match.replace(',', ''))
-                                if value > 0:
-                                    metrics[metric_type] = max(metrics.get(metric_type, 0), value)
-                        except (ValueError, AttributeError):
-                            continue
-            
-            # Validate and return if we found meaningful data
-            if metrics and any(v > 100 for v in metrics.values()):  # Minimum threshold
+            # Strategy 3: JSON script blobs (shared data, JSON-LD), then visible text
+            metrics, source = extract_metrics(html)
+            if metrics:
                 views = metrics.get('views', 0)
                 likes = metrics.get('likes', 0)
                 comments = metrics.get('comments', 0)
                 
-                logger.info(f"Extracted Instagram metrics from patterns: views={views}, likes={likes}, comments={comments}")
+                logger.info(f"Extracted Instagram metrics from {source}: views={views}, likes={likes}, comments={comments}")
                 return self._validate_and_complete_metrics(views, likes, comments, 'instagram')
             
-            # Strategy 6: Fallback number extraction
-            fallback_numbers = re.findall(r'\b(\d{3,})\b', html)  # Any number 3+ digits
-            if fallback_numbers:
-                numbers = [int(n) for n in fallback_numbers if 1000 <= int(n) <= 50000000]  # Reasonable range for Instagram
-                if len(numbers) >= 3:
-                    # Use the largest numbers as rough estimates
-                    numbers.sort(reverse=True)
-                    views = numbers[0] if numbers[0] > 0 else 0
-                    likes = numbers[1] if len(numbers) > 1 and numbers[1] > 0 else int(views * 0.05)
-                    comments = numbers[2] if len(numbers) > 2 and numbers[2] > 0 else int(views * 0.01)
-                    
-                    logger.warning(f"Using fallback number extraction for Instagram: views={views}, likes={likes}, comments={comments}")
-                    return self._validate_and_complete_metrics(views, likes, comments, 'instagram')
+            # Strategy 4: Fallback number extraction
+            numbers = extract_large_numbers(html, 1000, 50000000)  # Reasonable range for Instagram
+            if len(numbers) >= 3:
+                # Use the largest numbers as rough estimates
+                views, likes, comments = numbers[:3]
+                
+                logger.warning(f"Using fallback number extraction for Instagram: views={views}, likes={likes}, comments={comments}")
+                return self._validate_and_complete_metrics(views, likes, comments, 'instagram')
             
-            # If all else fails, return estimated data
-            logger.warning(f"Could not extract real data from Instagram {url}, using fallback")
-            return self._get_fallback_data()
+            logger.warning(f"Could not extract data from Instagram {url}")
+            return None
             
         except Exception as e:
             logger.error(f"Error fetching Instagram data for {url}: {e}")
-            return self._get_fallback_data()
+            return None
     
     def fetch_tiktok_data(self, url):
         try:
@@ -343,6 +362,10 @@ class SocialMediaFetcher:
                         views = int(view_str)
                     break
             
+            if not views:
+                logger.warning(f"Could not extract data from TikTok {url}")
+                return None
+            
             # TikTok typically has higher engagement rates
             likes = int(views * 0.12)  # 12% like rate
             comments = int(views * 0.02)  # 2% comment rate
@@ -355,316 +378,267 @@ class SocialMediaFetcher:
             
         except Exception as e:
             logger.error(f"Error fetching TikTok data for {url}: {e}")
-            return self._get_fallback_data()
+            return None
     
     def fetch_threads_data(self, url):
         try:
-            # Enhanced headers to better mimic real browser
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.9',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'none',
-                'Sec-Ch-Ua': '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
-                'Sec-Ch-Ua-Mobile': '?0',
-                'Sec-Ch-Ua-Platform': '"macOS"',
-                'Cache-Control': 'no-cache',
-                'Pragma': 'no-cache'
-            }
-            
             # Make request with enhanced headers
-            response = self.session.get(url, headers=headers, timeout=15)
+            response = self.session.get(url, headers=BROWSER_HEADERS, timeout=15)
             response.raise_for_status()
             
             html = response.text
             logger.debug(f"Threads response status: {response.status_code}, content length: {len(html)}")
             
-            # Strategy 1: Look for JSON data in script tags
-            json_patterns = [
-                r'<script[^>]*>\s*window\.__INITIAL_DATA__\s*=\s*({.*?});?\s*</script>',
-                r'<script[^>]*>\s*window\.__STATE__\s*=\s*({.*?});?\s*</script>',
-                r'"thread_items":\s*\[(.*?)\]',
-                r'"media_overlay_info":\s*({[^}]*"view_count"[^}]*})',
-            ]
-            
-            for pattern in json_patterns:
-                matches = re.findall(pattern, html, re.DOTALL | re.IGNORECASE)
-                for match in matches:
-                    try:
-                        if isinstance(match, tuple):
-                            match = match[0] if match[0] else match[1]
-                        
-                        # Extract numbers from JSON-like structures
-                        view_match = re.search(r'"view_count"[":]*\s*(\d+)', match)
-                        like_match = re.search(r'"like_count"[":]*\s*(\d+)', match)
-                        reply_match = re.search(r'"reply_count"[":]*\s*(\d+)', match)
-                        
-                        if view_match or like_match or reply_match:
-                            views = int(view_match.group(1)) if view_match else 0
-                            likes = int(like_match.group(1)) if like_match else 0
-                            comments = int(reply_match.group(1)) if reply_match else 0
-                            
-                            if views > 0 or likes > 0 or comments > 0:
-                                logger.info(f"Extracted Threads data from JSON: views={views}, likes={likes}, comments={comments}")
-                                return self._validate_and_complete_metrics(views, likes, comments, 'threads')
-                    except (json.JSONDecodeError, ValueError, AttributeError):
-                        continue
-            
-            # Strategy 2: Enhanced pattern matching with more variations
-            enhanced_patterns = [
-                # Views patterns
-                (r'"viewCount"[":]*\s*(\d+)', 'views'),
-                (r'"view_count"[":]*\s*(\d+)', 'views'),
-                (r'views[":]*\s*(\d+(?:,\d+)*)', 'views'),
-                (r'(\d+(?:,\d+)*)\s*views', 'views'),
-                (r'(\d+(?:\.\d+)?[KMB])\s*views', 'views_formatted'),
-                
-                # Likes patterns
-                (r'"likeCount"[":]*\s*(\d+)', 'likes'),
-                (r'"like_count"[":]*\s*(\d+)', 'likes'),
-                (r'likes[":]*\s*(\d+(?:,\d+)*)', 'likes'),
-                (r'(\d+(?:,\d+)*)\s*likes', 'likes'),
-                (r'(\d+(?:\.\d+)?[KMB])\s*likes', 'likes_formatted'),
-                
-                # Comments/replies patterns
-                (r'"replyCount"[":]*\s*(\d+)', 'comments'),
-                (r'"reply_count"[":]*\s*(\d+)', 'comments'),
-                (r'replies[":]*\s*(\d+(?:,\d+)*)', 'comments'),
-                (r'(\d+(?:,\d+)*)\s*replies', 'comments'),
-                (r'(\d+(?:\.\d+)?[KMB])\s*replies', 'comments_formatted'),
-            ]
-            
-            metrics = {}
-            for pattern, metric_type in enhanced_patterns:
-                matches = re.findall(pattern, html, re.IGNORECASE)
-                if matches:
-                    for match in matches:
-                        try:
-                            if metric_type.endswith('_formatted'):
-                                # Handle K, M, B suffixes
-                                base_type = metric_type.replace('_formatted', '')
-                                value = self._parse_formatted_number(match)
-                                if value > 0:
-                                    metrics[base_type] = max(metrics.get(base_type, 0), value)
-                            else:
-                                # Regular numbers
-                                value = int(match.replace(',', ''))
-                                if value > 0:
-                                    metrics[metric_type] = max(metrics.get(metric_type, 0), value)
-                        except (ValueError, AttributeError):
-                            continue
-            
-            # Validate and return if we found meaningful data
-            if metrics and any(v > 100 for v in metrics.values()):  # Minimum threshold
+            # Strategy 1: JSON script blobs, then visible "N views/likes/replies" text
+            metrics, source = extract_metrics(html)
+            if metrics:
                 views = metrics.get('views', 0)
                 likes = metrics.get('likes', 0)
                 comments = metrics.get('comments', 0)
                 
-                logger.info(f"Extracted Threads metrics from patterns: views={views}, likes={likes}, comments={comments}")
+                logger.info(f"Extracted Threads data from {source}: views={views}, likes={likes}, comments={comments}")
                 return self._validate_and_complete_metrics(views, likes, comments, 'threads')
             
             # If still no data, try one more approach with relaxed patterns
-            fallback_numbers = re.findall(r'\b(\d{3,})\b', html)  # Any number 3+ digits
-            if fallback_numbers:
-                numbers = [int(n) for n in fallback_numbers if 1000 <= int(n) <= 10000000]  # Reasonable range
-                if len(numbers) >= 3:
-                    # Use the largest numbers as rough estimates
-                    numbers.sort(reverse=True)
-                    views = numbers[0] if numbers[0] > 0 else 0
-                    likes = numbers[1] if len(numbers) > 1 and numbers[1] > 0 else int(views * 0.08)
-                    comments = numbers[2] if len(numbers) > 2 and numbers[2] > 0 else int(views * 0.01)
-                    
-                    logger.warning(f"Using fallback number extraction for Threads: views={views}, likes={likes}, comments={comments}")
-                    return self._validate_and_complete_metrics(views, likes, comments, 'threads')
+            numbers = extract_large_numbers(html, 1000, 10000000)  # Reasonable range
+            if len(numbers) >= 3:
+                # Use the largest numbers as rough estimates
+                views, likes, comments = numbers[:3]
+                
+                logger.warning(f"Using fallback number extraction for Threads: views={views}, likes={likes}, comments={comments}")
+                return self._validate_and_complete_metrics(views, likes, comments, 'threads')
             
-            # Last resort: return realistic fallback
-            logger.warning(f"No valid data extracted from Threads {url}, using realistic fallback")
-            return self._get_threads_fallback_data()
+            logger.warning(f"Could not extract data from Threads {url}")
+            return None
             
         except Exception as e:
             logger.error(f"Error fetching Threads data for {url}: {e}")
-            return self._get_threads_fallback_data()
+            return None
     
-    def fetch_tumblr_data(self, url):
+    def _tumblr_get_posts(self, blog_name, api_key, **params):
+        """Call the /posts endpoint of a blog and return the list of posts"""
+        self._rate_limit('tumblr')
+        response = self.session.get(
+            f"{TUMBLR_API}/blog/{blog_name}/posts",
+            params={'api_key': api_key, **params},
+            timeout=15
+        )
+        response.raise_for_status()
+        data = response.json()
+        return data.get('response', {}).get('posts', [])
+    
+    def _fetch_tumblr_blog(self, blog_name, post_ids, api_key):
+        """Fetch the given posts of one blog with as few paginated /posts calls as possible"""
+        wanted = set(post_ids)
+        found = {}
+        
+        def collect(posts):
+            for post in posts:
+                post_id = str(post.get('id_string') or post.get('id'))
+                if 'timestamp' in post:
+                    self._tumblr_timestamps[post_id] = post['timestamp']
+                if post_id in wanted:
+                    found[post_id] = post
+        
+        try:
+            # Anchor the pagination just after the newest tracked post. Tumblr IDs grow
+            # over time, so the largest ID is the newest post.
+            newest_id = max(wanted, key=int)
+            if newest_id not in self._tumblr_timestamps:
+                collect(self._tumblr_get_posts(blog_name, api_key, id=newest_id))
+            
+            if newest_id in self._tumblr_timestamps:
+                before = self._tumblr_timestamps[newest_id] + 1
+                seen = set()
+                for _ in range(TUMBLR_MAX_PAGES):
+                    if wanted <= found.keys():
+                        break
+                    posts = self._tumblr_get_posts(blog_name, api_key, before=before, limit=TUMBLR_PAGE_SIZE)
+                    page_ids = {str(post.get('id_string') or post.get('id')) for post in posts}
+                    if not page_ids - seen:
+                        break
+                    seen |= page_ids
+                    collect(posts)
+                    # before is exclusive: staying one second above the oldest timestamp keeps posts that share
+                    # it but fell off this page. If the whole page shares it, move past it; the individual
+                    # fetches below pick up what that skips.
+                    oldest = min(post.get('timestamp', before) for post in posts)
+                    before = oldest + 1 if oldest + 1 < before else oldest
+        except Exception as e:
+            logger.warning(f"Error paging through Tumblr blog {blog_name}, fetching the remaining posts individually: {e}")
+        
+        # Anything the pages did not cover is fetched individually
+        for post_id in wanted - found.keys():
+            try:
+                collect(self._tumblr_get_posts(blog_name, api_key, id=post_id))
+            except Exception as e:
+                logger.error(f"Error fetching Tumblr post {blog_name}/{post_id}: {e}")
+        
+        return found
+    
+    def fetch_tumblr_batch(self, urls):
+        """Fetch many Tumblr posts, grouped by blog, over the pooled session"""
+        results = {}
         try:
-            # Extract blog name and post ID from Tumblr URL
-            # URL format: https://www.tumblr.com/{blog_name}/{numerical_post_id}/text-slug-here
-            url_parts = url.split('/')
-            if len(url_parts) < 5:
-                logger.error(f"Invalid Tumblr URL format: {url}")
-                return self._get_fallback_data()
-            
-            blog_name = url_parts[3]
-            post_id = url_parts[4]  # This is the numerical ID
-            
-            # Debug logging to verify we're extracting the right parts
-            logger.debug(f"Tumblr URL parts: {url_parts}")
-            logger.debug(f"Extracted blog_name: {blog_name}, post_id: {post_id}")
-            
             # Get Tumblr API key from environment
             api_key = os.environ.get('TUMBLR_API_KEY')
             
             if not api_key:
-                logger.warning("Tumblr API key not found in environment, using fallback data")
-                return self._get_fallback_data()
-            
-            # Make API request to get specific post data using /posts endpoint
-            api_url = f"https://api.tumblr.com/v2/blog/{blog_name}/posts"
-            params = {
-                'api_key': api_key,
-                'id': post_id
-            }
-            
-            response = requests.get(api_url, params=params, timeout=15)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            if 'response' not in data or 'posts' not in data['response'] or not data['response']['posts']:
-                logger.warning(f"No post data found for Tumblr post {post_id}")
-                return self._get_fallback_data()
+                logger.warning("Tumblr API key not found in environment, skipping Tumblr")
+                return {}
             
-            post = data['response']['posts'][0]
-            
-            # Extract engagement metrics
-            note_count = post.get('note_count', 0)  # Total notes (likes + reblogs + replies)
-            
-            # Tumblr doesn't provide detailed breakdowns in public API
-            # So we'll estimate based on typical Tumblr engagement patterns
-            # Tumblr engagement typically: ~60% likes, ~30% reblogs, ~10% replies
-            likes = int(note_count * 0.6)
-            reblogs = int(note_count * 0.3)  # Reblogs are like "shares" on other platforms
-            replies = int(note_count * 0.1)  # Comments/replies
-            
-            # For consistency with other platforms, we'll use:
-            # views = note_count (total engagement as a proxy for reach)
-            # likes = estimated likes
-            # comments = replies + reblogs (both are forms of engagement)
-            
-            views = note_count
-            total_likes = likes
-            comments = replies + reblogs
+            # Extract blog name and post ID from Tumblr URL
+            # URL format: https://www.tumblr.com/{blog_name}/{numerical_post_id}/text-slug-here
+            blogs = {}
+            for url in urls:
+                url_parts = url.split('/')
+                if len(url_parts) < 5:
+                    logger.error(f"Invalid Tumblr URL format: {url}")
+                    continue
+                
+                blog_name = url_parts[3]
+                post_id = url_parts[4]  # This is the numerical ID
+                blogs.setdefault(blog_name, {})[url] = post_id
             
-            logger.info(f"Successfully fetched Tumblr data for {blog_name}/{post_id}: views={views}, likes={total_likes}, comments={comments}, total_notes={note_count}")
+            for blog_name, blog_urls in blogs.items():
+                try:
+                    posts = self._fetch_tumblr_blog(blog_name, blog_urls.values(), api_key)
+                except Exception as e:
+                    logger.error(f"Error fetching Tumblr posts for blog {blog_name}: {e}")
+                    posts = {}
+                
+                for url, post_id in blog_urls.items():
+                    if post_id not in posts:
+                        logger.warning(f"No post data found for Tumblr post {post_id}")
+                        continue
+                    
+                    results[url] = self._tumblr_metrics(posts[post_id])
+                    logger.info(f"Successfully fetched Tumblr data for {blog_name}/{post_id}: {results[url]}")
             
-            return {
-                'views': views,
-                'likes': total_likes,
-                'comments': comments
-            }
+            return results
             
         except Exception as e:
-            logger.error(f"Error fetching Tumblr data for {url}: {e}")
-            return self._get_fallback_data()
+            logger.error(f"Error fetching Tumblr data for {len(urls)} posts: {e}")
+            return results
     
-    def fetch_bluesky_data(self, url):
+    def _tumblr_metrics(self, post):
+        # Extract engagement metrics
+        note_count = post.get('note_count', 0)  # Total notes (likes + reblogs + replies)
+        
+        # Tumblr doesn't provide detailed breakdowns in public API
+        # So we'll estimate based on typical Tumblr engagement patterns
+        # Tumblr engagement typically: ~60% likes, ~30% reblogs, ~10% replies
+        likes = int(note_count * 0.6)
+        reblogs = int(note_count * 0.3)  # Reblogs are like "shares" on other platforms
+        replies = int(note_count * 0.1)  # Comments/replies
+        
+        # For consistency with other platforms, we'll use:
+        # views = note_count (total engagement as a proxy for reach)
+        # likes = estimated likes
+        # comments = replies + reblogs (both are forms of engagement)
+        
+        return {
+            'views': note_count,
+            'likes': likes,
+            'comments': replies + reblogs
+        }
+    
+    def fetch_tumblr_data(self, url):
+        return self.fetch_tumblr_batch([url]).get(url)
+    
+    def _get_bluesky_client(self):
+        """Create the Bluesky client once so its login and DID cache are reused"""
+        with self._bluesky_lock:
+            if self._bluesky is None:
+                bluesky_username = os.environ.get('BLUESKY_USERNAME')
+                bluesky_password = os.environ.get('BLUESKY_PASSWORD')
+                if not bluesky_username or not bluesky_password:
+                    return None
+                self._bluesky = BlueskyClient(
+                    self.session, bluesky_username, bluesky_password,
+                    rate_limit=lambda: self._rate_limit('bluesky')
+                )
+            return self._bluesky
+    
+    def fetch_bluesky_batch(self, urls):
+        """Fetch many Bluesky posts through one session and bulk getPosts calls"""
+        results = {}
         try:
-            # Extract the DID and rkey from the Bluesky URL
-            # URL format: https://bsky.app/profile/{handle}/post/{rkey}
-            url_parts = url.split('/')
-            if len(url_parts) < 6:
-                logger.error(f"Invalid Bluesky URL format: {url}")
-                return self._get_fallback_data()
-            
-            handle = url_parts[4]
-            rkey = url_parts[6]
-            
-            # Get Bluesky API credentials from environment
-            bluesky_username = os.environ.get('BLUESKY_USERNAME')
-            bluesky_password = os.environ.get('BLUESKY_PASSWORD')
-            
-            if not bluesky_username or not bluesky_password:
-                logger.warning("Bluesky credentials not found in environment, using fallback data")
-                return self._get_fallback_data()
-            
-            # Step 1: Create session with Bluesky
-            session_url = "https://bsky.social/xrpc/com.atproto.server.createSession"
-            session_data = {
-                "identifier": bluesky_username,
-                "password": bluesky_password
-            }
-            
-            session_response = requests.post(session_url, json=session_data, timeout=15)
-            session_response.raise_for_status()
-            session_info = session_response.json()
-            
-            access_token = session_info['accessJwt']
-            
-            # Step 2: Resolve handle to DID if needed
-            if not handle.startswith('did:'):
-                resolve_url = f"https://bsky.social/xrpc/com.atproto.identity.resolveHandle"
-                resolve_params = {"handle": handle}
-                resolve_response = requests.get(resolve_url, params=resolve_params, timeout=15)
-                resolve_response.raise_for_status()
-                handle_did = resolve_response.json()['did']
-            else:
-                handle_did = handle
-            
-            # Step 3: Get the post data
-            post_uri = f"at://{handle_did}/app.bsky.feed.post/{rkey}"
-            post_url = "https://bsky.social/xrpc/app.bsky.feed.getPostThread"
-            post_params = {"uri": post_uri}
-            
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json"
-            }
-            
-            post_response = requests.get(post_url, params=post_params, headers=headers, timeout=15)
-            post_response.raise_for_status()
-            post_data = post_response.json()
-            
-            # Extract engagement metrics
-            thread = post_data.get('thread', {})
-            post = thread.get('post', {})
+            client = self._get_bluesky_client()
+            if client is None:
+                logger.warning("Bluesky credentials not found in environment, skipping Bluesky")
+                return {}
             
-            like_count = post.get('likeCount', 0)
-            reply_count = post.get('replyCount', 0)
-            repost_count = post.get('repostCount', 0)
-            
-            # For Bluesky, we'll use:
-            # views = like_count + reply_count + repost_count (total engagement as proxy for reach)
-            # likes = like_count
-            # comments = reply_count + repost_count (both are forms of engagement)
-            
-            views = like_count + reply_count + repost_count
-            likes = like_count
-            comments = reply_count + repost_count
+            # URL format: https://bsky.app/profile/{handle}/post/{rkey}
+            post_uris = {}
+            for url in urls:
+                url_parts = url.split('/')
+                if len(url_parts) < 7:
+                    logger.error(f"Invalid Bluesky URL format: {url}")
+                    continue
+                
+                handle = url_parts[4]
+                rkey = url_parts[6]
+                handle_did = client.resolve_handle(handle)
+                post_uris[url] = f"at://{handle_did}/app.bsky.feed.post/{rkey}"
+            
+            posts = client.get_posts(list(post_uris.values()))
+            
+            for url, post_uri in post_uris.items():
+                post = posts.get(post_uri)
+                if post is None:
+                    logger.warning(f"No post data found for Bluesky post {post_uri}")
+                    continue
+                
+                like_count = post.get('likeCount', 0)
+                reply_count = post.get('replyCount', 0)
+                repost_count = post.get('repostCount', 0)
+                
+                # For Bluesky, we'll use:
+                # views = like_count + reply_count + repost_count (total engagement as proxy for reach)
+                # likes = like_count
+                # comments = reply_count + repost_count (both are forms of engagement)
+                
+                views = like_count + reply_count + repost_count
+                likes = like_count
+                comments = reply_count + repost_count
+                
+                logger.info(f"Successfully fetched Bluesky data for {post_uri}: views={views}, likes={likes}, comments={comments}")
+                results[url] = {
+                    'views': views,
+                    'likes': likes,
+                    'comments': comments
+                }
             
-            logger.info(f"Successfully fetched Bluesky data for {handle}/{rkey}: views={views}, likes={likes}, comments={comments}")
-            
-            return {
-                'views': views,
-                'likes': likes,
-                'comments': comments
-            }
+            return results
             
         except Exception as e:
-            logger.error(f"Error fetching Bluesky data for {url}: {e}")
-            return self._get_fallback_data()
+            logger.error(f"Error fetching Bluesky data for {len(urls)} posts: {e}")
+            return results
+    
+    def fetch_bluesky_data(self, url):
+        return self.fetch_bluesky_batch([url]).get(url)
     
-    def _rate_limit(self):
-        """Add delay between requests to avoid getting blocked"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
+    def _rate_limit(self, platform):
+        """Add delay between requests to the same platform to avoid getting blocked"""
+        min_delay = random.uniform(*PLATFORM_DELAYS.get(platform, DEFAULT_DELAY))
         
-        # Minimum 2-5 seconds between requests
-        min_delay = random.uniform(2, 5)
+        with self._rate_lock:
+            # Reserve the next slot for this platform so concurrent callers queue up
+            now = time.time()
+            next_slot = max(now, self.last_request_time.get(platform, 0) + min_delay)
+            self.last_request_time[platform] = next_slot
         
-        if time_since_last < min_delay:
-            sleep_time = min_delay - time_since_last
-            logger.debug(f"Rate limiting: sleeping for {sleep_time:.2f} seconds")
+        sleep_time = next_slot - now
+        if sleep_time > 0:
+            logger.debug(f"Rate limiting {platform}: sleeping for {sleep_time:.2f} seconds")
+            RATE_LIMIT_SLEEP.inc(sleep_time, platform=platform)
             time.sleep(sleep_time)
-        
-        self.last_request_time = time.time()
     
     def fetch_data(self, platform, url):
         try:
             # Add rate limiting
-            self._rate_limit()
+            self._rate_limit(platform)
             
             if platform == 'youtube':
                 return self.fetch_youtube_data(url)
@@ -679,26 +653,50 @@ class SocialMediaFetcher:
             elif platform == 'bluesky':
                 return self.fetch_bluesky_data(url)
             else:
-                return self._get_fallback_data()
+                logger.error(f"Unknown platform {platform}")
+                return None
                 
         except Exception as e:
             logger.error(f"Error fetching data from {platform} for {url}: {e}")
-            return self._get_fallback_data()
+            return None
     
-    def _parse_formatted_number(self, num_str):
-        """Parse numbers with K, M, B suffixes"""
-        try:
-            num_str = str(num_str).strip().upper()
-            if num_str.endswith('K'):
-                return int(float(num_str[:-1]) * 1000)
-            elif num_str.endswith('M'):
-                return int(float(num_str[:-1]) * 1000000)
-            elif num_str.endswith('B'):
-                return int(float(num_str[:-1]) * 1000000000)
-            else:
-                return int(float(num_str))
-        except (ValueError, AttributeError):
-            return 0
+    def fetch_batch(self, platform, urls):
+        """Fetch several URLs of one platform, returning a dict of url -> metrics.
+        
+        A URL whose fetch failed is left out or maps to None; nothing is made
+        up in its place. URLs are also left out while the platform's circuit is
+        open, so a blocked platform costs nothing until its cooldown has passed.
+        """
+        results = self._fetch_batch(platform, urls)
+        fetched = sum(1 for url in urls if results.get(url) is not None)
+        FETCH_RESULTS.inc(fetched, platform=platform, outcome='success')
+        FETCH_RESULTS.inc(len(urls) - fetched, platform=platform, outcome='failure')
+        return results
+    
+    def _fetch_batch(self, platform, urls):
+        health = self.health.get(platform)
+        if health is not None and not health.available():
+            logger.warning(f"Skipping {len(urls)} {platform} URLs, its circuit is open")
+            return {}
+        
+        if platform == 'youtube':
+            return self.fetch_youtube_batch(urls)
+        if platform == 'bluesky':
+            return self.fetch_bluesky_batch(urls)
+        if platform == 'tumblr':
+            return self.fetch_tumblr_batch(urls)
+        
+        results = {}
+        for url in urls:
+            if health is not None and not health.available():
+                logger.warning(f"Skipping the remaining {len(urls) - len(results)} {platform} URLs, its circuit opened")
+                break
+            results[url] = self.fetch_data(platform, url)
+        return results
+    
+    def health_stats(self):
+        """Circuit state and request/failure/latency counters per platform"""
+        return {platform: health.snapshot() for platform, health in self.health.items()}
     
     def _validate_and_complete_metrics(self, views, likes, comments, platform):
         """Validate metrics and fill in missing data with platform-specific estimates"""
@@ -706,6 +704,7 @@ class SocialMediaFetcher:
         if views < 0: views = 0
         if likes < 0: likes = 0
         if comments < 0: comments = 0
+        measured = (views, likes, comments)
         
         # Platform-specific engagement rates
         if platform == 'threads':
@@ -732,32 +731,13 @@ class SocialMediaFetcher:
             if likes == 0:
                 likes = int(comments * (like_rate / comment_rate))
         
+        if (views, likes, comments) != measured:
+            FETCH_ESTIMATED.inc(platform=platform)
         return {
             'views': views,
             'likes': likes,
             'comments': comments
         }
-    
-    def _get_threads_fallback_data(self):
-        """Return more realistic Threads fallback data"""
-        import random
-        # Threads typically has lower engagement than other platforms
-        base_views = random.randint(50000, 300000)
-        return {
-            'views': base_views,
-            'likes': int(base_views * random.uniform(0.04, 0.08)),  # 4-8% like rate
-            'comments': int(base_views * random.uniform(0.005, 0.012))  # 0.5-1.2% comment rate
-        }
-
-    def _get_fallback_data(self):
-        # Return realistic fallback data when scraping fails
-        import random
-        base_views = random.randint(10000, 500000)
-        return {
-            'views': base_views,
-            'likes': int(base_views * random.uniform(0.03, 0.15)),
-            'comments': int(base_views * random.uniform(0.005, 0.03))
-        }
 
 
 def test_threads_fetching():
@@ -0,0 +1,323 @@
+"""Storage backends for the engagement history files.
+
+Both backends store named blobs and expose the same small interface:
+
+- read(name) -> (data, generation) or None if the blob does not exist
+- signature(name, max_age=None) -> cheap change marker, or None if the blob does not exist;
+  max_age bounds how old a cached marker may be
+- write(name, data, if_generation_match=None) -> new generation
+- append(name, data) -> new generation
+- acquire_lease(name, owner, ttl) -> True if owner now holds the lease
+- release_lease(name, owner)
+
+A generation identifies one version of a blob. Passing it back as
+if_generation_match makes a write fail with PreconditionFailed if someone else
+changed the blob in the meantime; 0 means "only if it does not exist yet".
+
+A lease gives one owner across processes and instances the right to write
+the history. Acquiring a lease the owner already holds renews it.
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import quote
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+GCS_API = 'https://storage.googleapis.com'
+GCS_SCOPE = 'https://www.googleapis.com/auth/devstorage.read_write'
+
+
+class PreconditionFailed(Exception):
+    """The blob changed since the generation the caller based its write on"""
+
+
+class LocalStorage:
+    """Blobs are files on the local filesystem; names are paths"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.leases = {}  # name -> (owner, open file holding the flock)
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        """A forked worker must not keep the parent's flocks alive or inherit a lock held by one of its threads"""
+        self.lock = threading.Lock()
+        for _, lease_file in self.leases.values():
+            lease_file.close()
+        self.leases = {}
+
+    def _generation(self, name):
+        try:
+            return os.stat(name).st_mtime_ns
+        except OSError:
+            return 0
+
+    def signature(self, name, max_age=None):
+        # Always current, so max_age does not matter
+        try:
+            stat = os.stat(name)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def read(self, name):
+        try:
+            with open(name, 'rb') as f:
+                generation = os.fstat(f.fileno()).st_mtime_ns
+                return f.read(), generation
+        except FileNotFoundError:
+            return None
+
+    def write(self, name, data, if_generation_match=None):
+        """Replace the file atomically: readers see the old or the new content, never a mix"""
+        with self.lock:
+            # Only guards against writers in this process; see the refresh lease for cross-process safety
+            if if_generation_match is not None and self._generation(name) != if_generation_match:
+                raise PreconditionFailed(name)
+            tmp_path = f"{name}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, name)
+            return self._generation(name)
+
+    def append(self, name, data):
+        with self.lock:
+            with open(name, 'ab') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            return self._generation(name)
+
+    def acquire_lease(self, name, owner, ttl):
+        """An exclusive flock on the file `name`. The OS drops it when the process exits, so ttl is not needed."""
+        with self.lock:
+            if name in self.leases:
+                # Held by this process: renewing if it is the same owner, taken if not
+                return self.leases[name][0] == owner
+            lease_file = open(name, 'a+')
+            try:
+                fcntl.flock(lease_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lease_file.close()
+                return False
+            lease_file.truncate(0)
+            lease_file.write(f"{owner}\n")
+            lease_file.flush()
+            self.leases[name] = (owner, lease_file)
+            return True
+
+    def release_lease(self, name, owner):
+        with self.lock:
+            if name in self.leases and self.leases[name][0] == owner:
+                # Closing the file releases the flock
+                self.leases.pop(name)[1].close()
+
+
+class GCSStorage:
+    """Blobs are objects in a Google Cloud Storage bucket, accessed through the JSON API.
+
+    Downloads are conditional on the cached generation, so an unchanged object
+    costs a 304 instead of a download. Cached copies are also kept in
+    cache_dir so a restarted instance does not re-download unchanged objects.
+    Set STORAGE_EMULATOR_HOST (e.g. http://localhost:4443 for fake-gcs-server)
+    to talk to a local emulator without credentials.
+    """
+
+    def __init__(self, bucket, cache_dir=None, poll_interval=30, emulator_host=None):
+        self.bucket = bucket
+        self.cache_dir = cache_dir
+        self.poll_interval = poll_interval
+        self.emulator_host = emulator_host
+        self.base_url = (emulator_host or GCS_API).rstrip('/')
+        self.session = requests.Session()
+        self.credentials = None
+        self.cache = {}  # name -> (data, generation)
+        self.signatures = {}  # name -> (checked_at, generation)
+        self.lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _headers(self):
+        if self.emulator_host:
+            return {}
+        with self.lock:
+            if self.credentials is None:
+                import google.auth
+                self.credentials, _ = google.auth.default(scopes=[GCS_SCOPE])
+            if not self.credentials.valid:
+                import google.auth.transport.requests
+                self.credentials.refresh(google.auth.transport.requests.Request())
+            return {'Authorization': f"Bearer {self.credentials.token}"}
+
+    def _object_url(self, name):
+        return f"{self.base_url}/storage/v1/b/{self.bucket}/o/{quote(name, safe='')}"
+
+    def _cache_path(self, name):
+        digest = hashlib.sha256(name.encode('utf-8')).hexdigest()[:32]
+        return os.path.join(self.cache_dir, digest)
+
+    def _cached(self, name):
+        if name in self.cache:
+            return self.cache[name]
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._cache_path(name), 'rb') as f:
+                generation, _, data = f.read().partition(b'\n')
+            cached = (data, int(generation))
+        except (OSError, ValueError):
+            return None
+        self.cache[name] = cached
+        return cached
+
+    def _store_cache(self, name, data, generation):
+        self.cache[name] = (data, generation)
+        self.signatures[name] = (time.time(), generation)
+        if self.cache_dir:
+            tmp_path = self._cache_path(name) + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(str(generation).encode('ascii') + b'\n' + data)
+            os.replace(tmp_path, self._cache_path(name))
+
+    def _forget(self, name):
+        self.cache.pop(name, None)
+        self.signatures[name] = (time.time(), None)
+        if self.cache_dir:
+            try:
+                os.remove(self._cache_path(name))
+            except OSError:
+                pass
+
+    def signature(self, name, max_age=None):
+        """Current generation of an object, checked at most once per poll_interval (or max_age seconds)"""
+        checked_at, generation = self.signatures.get(name, (0, None))
+        if time.time() - checked_at < (self.poll_interval if max_age is None else max_age):
+            return generation
+
+        response = self.session.get(
+            self._object_url(name), params={'fields': 'generation'}, headers=self._headers(), timeout=15
+        )
+        if response.status_code == 404:
+            generation = None
+        else:
+            response.raise_for_status()
+            generation = int(response.json()['generation'])
+        self.signatures[name] = (time.time(), generation)
+        return generation
+
+    def read(self, name):
+        cached = self._cached(name)
+        params = {'alt': 'media'}
+        if cached is not None:
+            params['ifGenerationNotMatch'] = cached[1]
+
+        response = self.session.get(self._object_url(name), params=params, headers=self._headers(), timeout=60)
+        if response.status_code == 304 and cached is not None:
+            self.signatures[name] = (time.time(), cached[1])
+            return cached
+        if response.status_code == 404:
+            self._forget(name)
+            return None
+        response.raise_for_status()
+
+        generation = int(response.headers['x-goog-generation'])
+        self._store_cache(name, response.content, generation)
+        return response.content, generation
+
+    def write(self, name, data, if_generation_match=None):
+        params = {'uploadType': 'media', 'name': name}
+        if if_generation_match is not None:
+            params['ifGenerationMatch'] = if_generation_match
+
+        response = self.session.post(
+            f"{self.base_url}/upload/storage/v1/b/{self.bucket}/o",
+            params=params,
+            data=data,
+            headers={**self._headers(), 'Content-Type': 'application/octet-stream'},
+            timeout=60
+        )
+        if response.status_code == 412:
+            raise PreconditionFailed(name)
+        response.raise_for_status()
+
+        generation = int(response.json()['generation'])
+        self._store_cache(name, data, generation)
+        return generation
+
+    def append(self, name, data, attempts=5):
+        """GCS objects are immutable, so appending is a read-modify-write guarded by the generation"""
+        for attempt in range(attempts):
+            current = self.read(name)
+            existing, generation = current if current is not None else (b'', 0)
+            try:
+                return self.write(name, existing + data, if_generation_match=generation)
+            except PreconditionFailed:
+                logger.warning(f"Concurrent update of gs://{self.bucket}/{name}, retrying append")
+                time.sleep(0.1 * (attempt + 1))
+        raise PreconditionFailed(name)
+
+    def acquire_lease(self, name, owner, ttl):
+        """The lease is a small JSON object naming its owner and expiry, replaced only with ifGenerationMatch.
+
+        An expired lease can be taken over, so a crashed owner blocks others for at most ttl seconds.
+        """
+        current = self.read(name)
+        generation = 0
+        if current is not None:
+            data, generation = current
+            try:
+                lease = json.loads(data)
+            except ValueError:
+                lease = {}
+            if lease.get('owner') not in (None, owner) and lease.get('expires', 0) > time.time():
+                return False
+
+        lease = json.dumps({'owner': owner, 'expires': time.time() + ttl}).encode('utf-8')
+        try:
+            self.write(name, lease, if_generation_match=generation)
+        except PreconditionFailed:
+            # Someone else took or renewed it between our read and write
+            return False
+        return True
+
+    def release_lease(self, name, owner):
+        current = self.read(name)
+        if current is None:
+            return
+        data, generation = current
+        try:
+            if json.loads(data).get('owner') != owner:
+                return
+        except ValueError:
+            return
+        try:
+            self.write(name, json.dumps({'owner': None, 'expires': 0}).encode('utf-8'), if_generation_match=generation)
+        except PreconditionFailed:
+            pass
+
+
+def create_storage():
+    """Build the storage backend selected by STORAGE_BACKEND (local or gcs)"""
+    backend = os.environ.get('STORAGE_BACKEND', 'local')
+    if backend == 'local':
+        return LocalStorage()
+    if backend == 'gcs':
+        bucket = os.environ.get('GCS_BUCKET')
+        if not bucket:
+            raise ValueError("GCS_BUCKET must be set when STORAGE_BACKEND=gcs")
+        return GCSStorage(
+            bucket,
+            cache_dir=os.environ.get('GCS_CACHE_DIR') or None,
+            poll_interval=int(os.environ.get('GCS_POLL_INTERVAL', 30)),
+            emulator_host=os.environ.get('STORAGE_EMULATOR_HOST') or None
+        )
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
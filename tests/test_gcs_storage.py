@@ -0,0 +1,168 @@
+"""GCSStorage against an in-process fake of the few Cloud Storage JSON API calls it makes.
+
+Run with `python -m unittest discover tests` (or pytest).
+"""
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, unquote, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import GCSStorage, PreconditionFailed  # noqa: E402
+
+BUCKET = 'fools-gold-test'
+
+
+class FakeGCS:
+    """Objects with generations, conditional downloads and uploads, and a log of the answered requests"""
+
+    def __init__(self):
+        self.objects = {}  # name -> (data, generation)
+        self.next_generation = 1
+        self.lock = threading.Lock()
+        self.log = []  # (method, name, status)
+        self.before_upload = []  # Callables run, once each, before the next uploads are handled
+
+    def put(self, name, data):
+        with self.lock:
+            generation = self.next_generation
+            self.next_generation += 1
+            self.objects[name] = (data, generation)
+            return generation
+
+    def handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status, body=b'', headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                name = unquote(url.path.split(f'/storage/v1/b/{BUCKET}/o/', 1)[1])
+                with fake.lock:
+                    stored = fake.objects.get(name)
+                if stored is None:
+                    status = 404
+                    self._reply(404)
+                elif params.get('alt') != 'media':
+                    status = 200
+                    self._reply(200, json.dumps({'generation': str(stored[1])}).encode('utf-8'))
+                elif params.get('ifGenerationNotMatch') == str(stored[1]):
+                    status = 304
+                    self._reply(304)
+                else:
+                    status = 200
+                    self._reply(200, stored[0], {'x-goog-generation': str(stored[1])})
+                fake.log.append(('GET', name, status))
+
+            def do_POST(self):
+                url = urlsplit(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                name = params['name']
+                while fake.before_upload:
+                    fake.before_upload.pop(0)()
+                with fake.lock:
+                    current = fake.objects.get(name)
+                    expected = params.get('ifGenerationMatch')
+                    if expected is not None and int(expected) != (current[1] if current else 0):
+                        status = 412
+                    else:
+                        status = 200
+                        generation = fake.next_generation
+                        fake.next_generation += 1
+                        fake.objects[name] = (data, generation)
+                fake.log.append(('POST', name, status))
+                if status == 412:
+                    self._reply(412)
+                else:
+                    self._reply(200, json.dumps({'name': name, 'generation': str(generation)}).encode('utf-8'))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class GCSStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeGCS()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.fake.handler())
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.emulator_host = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.storage = self.new_storage()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def new_storage(self):
+        return GCSStorage(BUCKET, poll_interval=0, emulator_host=self.emulator_host)
+
+    def test_write_with_stale_generation_fails(self):
+        generation = self.storage.write('history', b'one', if_generation_match=0)
+        self.fake.put('history', b'written elsewhere')
+
+        with self.assertRaises(PreconditionFailed):
+            self.storage.write('history', b'two', if_generation_match=generation)
+        with self.assertRaises(PreconditionFailed):
+            self.storage.write('history', b'two', if_generation_match=0)
+        self.assertEqual(self.fake.objects['history'][0], b'written elsewhere')
+
+    def test_unchanged_object_is_served_from_cache(self):
+        generation = self.fake.put('history', b'data')
+        self.assertEqual(self.storage.read('history'), (b'data', generation))
+        self.assertEqual(self.storage.read('history'), (b'data', generation))
+        self.assertEqual(self.fake.log[-1], ('GET', 'history', 304))
+        self.assertEqual(self.storage.signature('history'), generation)
+
+        changed = self.fake.put('history', b'new data')
+        self.assertEqual(self.storage.read('history'), (b'new data', changed))
+        self.assertEqual(self.fake.log[-1], ('GET', 'history', 200))
+
+    def test_missing_object(self):
+        self.assertIsNone(self.storage.read('history'))
+        self.assertIsNone(self.storage.signature('history'))
+
+    def test_append_retries_after_concurrent_write(self):
+        self.storage.write('log', b'a\n')
+        # Another writer appends between this append's read and its conditional upload
+        self.fake.before_upload.append(lambda: self.fake.put('log', b'a\nb\n'))
+
+        self.storage.append('log', b'c\n')
+
+        self.assertEqual(self.fake.objects['log'][0], b'a\nb\nc\n')
+        self.assertIn(('POST', 'log', 412), self.fake.log)
+
+    def test_lease_is_exclusive_until_it_expires(self):
+        other = self.new_storage()
+        self.assertTrue(self.storage.acquire_lease('lease', 'first', ttl=60))
+        self.assertTrue(self.storage.acquire_lease('lease', 'first', ttl=60))  # Renewing
+        self.assertFalse(other.acquire_lease('lease', 'second', ttl=60))
+
+        # The first owner stopped renewing: once the TTL has passed, the lease can be taken over
+        with mock.patch('storage.time.time', return_value=time.time() + 120):
+            self.assertTrue(other.acquire_lease('lease', 'second', ttl=60))
+        self.assertFalse(self.storage.acquire_lease('lease', 'first', ttl=60))
+
+        self.storage.release_lease('lease', 'first')  # Not the owner any more: a no-op
+        self.assertFalse(self.storage.acquire_lease('lease', 'first', ttl=60))
+        other.release_lease('lease', 'second')
+        self.assertTrue(self.storage.acquire_lease('lease', 'first', ttl=60))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+"""PlatformHealth's circuit breaker and HealthSession's retries, against an in-process server.
+
+Run with `python -m unittest discover tests` (or pytest).
+"""
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from health import CircuitOpen, HealthSession, PlatformHealth, parse_retry_after  # noqa: E402
+
+
+class PlatformHealthTest(unittest.TestCase):
+    def setUp(self):
+        self.health = PlatformHealth('test', failure_threshold=3, cooldown=60)
+
+    def fail(self, count):
+        for _ in range(count):
+            self.health.before_request()
+            self.health.record_failure(0.1)
+
+    def test_circuit_opens_after_failures_in_a_row(self):
+        self.fail(2)
+        self.health.before_request()
+        self.health.record_success(0.1)  # Resets the count
+        self.fail(2)
+        self.assertEqual(self.health.state, 'closed')
+        self.fail(1)
+
+        self.assertEqual(self.health.state, 'open')
+        self.assertFalse(self.health.available())
+        with self.assertRaises(CircuitOpen):
+            self.health.before_request()
+        self.assertEqual(self.health.snapshot()['short_circuited'], 1)
+
+    def test_one_trial_request_after_cooldown(self):
+        self.fail(3)
+        with mock.patch('health.time.time', return_value=time.time() + 61):
+            self.assertTrue(self.health.available())
+            self.health.before_request()
+            self.assertEqual(self.health.state, 'half_open')
+            with self.assertRaises(CircuitOpen):
+                self.health.before_request()  # The trial is still in flight
+
+            # A failed trial opens the circuit for another cooldown
+            self.health.record_failure(0.1)
+            self.assertEqual(self.health.state, 'open')
+            self.assertFalse(self.health.available())
+
+        with mock.patch('health.time.time', return_value=time.time() + 122):
+            self.health.before_request()
+            self.health.record_success(0.1)
+        self.assertEqual(self.health.state, 'closed')
+
+    def test_long_retry_after_opens_the_circuit_until_then(self):
+        self.health.before_request()
+        self.health.record_failure(0.1, retry_after=3600)
+
+        self.assertEqual(self.health.state, 'open')
+        self.assertGreater(self.health.open_until, time.time() + 3500)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after('120'), 120)
+        self.assertEqual(parse_retry_after('-5'), 0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after('soon'))
+        later = time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(time.time() + 300))
+        self.assertAlmostEqual(parse_retry_after(later), 300, delta=5)
+
+
+class HealthSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.responses = []  # (status, headers) answered in order, then 200
+        self.requests = 0
+        test = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                test.requests += 1
+                status, headers = test.responses.pop(0) if test.responses else (200, {})
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'ok')
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/post"
+        self.health = PlatformHealth('test', failure_threshold=5, cooldown=60, max_retries=2, max_delay=30)
+        self.session = HealthSession({'127.0.0.1': 'test'}, {'test': self.health})
+        # Backoff delays are not waited out
+        patcher = mock.patch('health.time.sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_server_errors_are_retried(self):
+        self.responses = [(503, {}), (429, {'Retry-After': '2'})]
+        response = self.session.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.requests, 3)
+        self.assertEqual(self.sleep.call_args_list[-1], mock.call(2.0))
+        self.assertEqual(self.health.snapshot()['retries'], 2)
+        self.assertEqual(self.health.consecutive_failures, 0)
+
+    def test_retries_give_up_after_max_retries(self):
+        self.responses = [(500, {})] * 5
+        self.assertEqual(self.session.get(self.url).status_code, 500)
+        self.assertEqual(self.requests, 3)
+
+    def test_long_retry_after_is_not_waited_for(self):
+        self.responses = [(429, {'Retry-After': '600'})]
+        self.assertEqual(self.session.get(self.url).status_code, 429)
+        self.assertEqual(self.requests, 1)
+        self.sleep.assert_not_called()
+
+        with self.assertRaises(CircuitOpen):
+            self.session.get(self.url)
+        self.assertEqual(self.requests, 1)
+
+    def test_other_hosts_are_not_tracked(self):
+        session = HealthSession({'example.com': 'test'}, {'test': self.health})
+        self.responses = [(503, {})]
+        self.assertEqual(session.get(self.url).status_code, 503)
+        self.assertEqual(self.health.snapshot()['requests'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+"""Log replay and compaction of the stored history, with DataManager on local storage in a temporary directory.
+
+Run with `python -m unittest discover tests` (or pytest).
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+from timeseries import History, encode_log_records  # noqa: E402
+
+VIDEO = next(iter(app.VIDEOS))
+
+
+def entry(timestamp, views=100):
+    return {
+        'timestamp': timestamp, 'total_views': views, 'total_likes': 0, 'total_comments': 0,
+        'views_youtube': views, 'likes_youtube': 0, 'comments_youtube': 0,
+    }
+
+
+class ReplayLogTest(unittest.TestCase):
+    def test_records_are_applied_in_order(self):
+        history = History([VIDEO])
+        appended = []
+        applied, torn = history.replay_log(encode_log_records([(VIDEO, entry(100)), (VIDEO, entry(200))]), appended)
+
+        self.assertEqual((applied, torn), (2, False))
+        self.assertEqual(history.get(VIDEO).timestamps.tolist(), [100, 200])
+        self.assertEqual([(video_id, record['timestamp']) for video_id, record in appended], [(VIDEO, 100), (VIDEO, 200)])
+
+    def test_records_already_in_the_history_are_skipped(self):
+        history = History([VIDEO])
+        history.append(VIDEO, entry(200))
+        applied, _ = history.replay_log(encode_log_records([(VIDEO, entry(100)), (VIDEO, entry(200)), (VIDEO, entry(300))]))
+
+        self.assertEqual(applied, 1)
+        self.assertEqual(history.get(VIDEO).timestamps.tolist(), [200, 300])
+
+    def test_torn_last_record(self):
+        raw = encode_log_records([(VIDEO, entry(100)), (VIDEO, entry(200))])
+        history = History([VIDEO])
+        self.assertEqual(history.replay_log(raw[:-10]), (1, True))
+        self.assertEqual(history.get(VIDEO).timestamps.tolist(), [100])
+
+        # Only the newline is missing: the record is whole, but a record appended next would be glued to it
+        history = History([VIDEO])
+        self.assertEqual(history.replay_log(raw[:-1]), (2, True))
+
+    def test_corrupt_record_in_the_middle_is_skipped(self):
+        # A torn record that a later append landed after
+        raw = encode_log_records([(VIDEO, entry(100))])
+        raw += encode_log_records([(VIDEO, entry(200))])[:-10] + encode_log_records([(VIDEO, entry(300))])
+        raw += b'{"video": "x"}\n' + encode_log_records([(VIDEO, entry(400))])
+        history = History([VIDEO])
+
+        with self.assertLogs('timeseries', level='WARNING'):
+            self.assertEqual(history.replay_log(raw), (2, False))
+        self.assertEqual(history.get(VIDEO).timestamps.tolist(), [100, 400])
+
+
+class StoredHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.base = os.path.join(self.directory, 'history.fgts')
+        self.log = self.base + '.log'
+        files = {
+            'DATA_FILE': os.path.join(self.directory, 'history.json'), 'HISTORY_FILE': self.base,
+            'HISTORY_LOG_FILE': self.log, 'REFRESH_SCHEDULE_FILE': self.base + '.schedule',
+            'REFRESH_LEASE_FILE': self.base + '.lease', 'COMPACT_AFTER': 3,
+        }
+        for name, value in files.items():
+            patcher = mock.patch.object(app, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.manager = self.new_manager()
+
+    def new_manager(self):
+        manager = app.DataManager()
+        self.assertTrue(manager.load_data())
+        return manager
+
+    def add(self, *timestamps):
+        for timestamp in timestamps:
+            self.manager.history.append(VIDEO, entry(timestamp))
+            self.manager.pending.append((VIDEO, entry(timestamp)))
+        self.manager.save_data()
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def stored_timestamps(self):
+        return self.new_manager().history.get(VIDEO).timestamps.tolist()
+
+    def test_points_are_appended_to_the_log_until_compaction(self):
+        self.add(100)  # No base file yet: written in full
+        self.assertEqual(self.read(self.log), b'')
+        self.add(200)
+        self.add(300)
+        self.assertEqual(self.read(self.log).count(b'\n'), 2)
+        self.assertEqual(self.stored_timestamps(), [100, 200, 300])
+
+        self.add(400)  # The third record since the last compaction
+        self.assertEqual(self.read(self.log), b'')
+        self.assertEqual(History.decode(self.read(self.base)).get(VIDEO).timestamps.tolist(), [100, 200, 300, 400])
+        self.assertEqual(self.stored_timestamps(), [100, 200, 300, 400])
+
+    def test_torn_log_is_compacted_on_load(self):
+        self.add(100)
+        self.add(200)
+        with open(self.log, 'ab') as f:
+            f.write(encode_log_records([(VIDEO, entry(300))])[:-5])
+
+        manager = self.new_manager()
+
+        self.assertFalse(manager.log_torn)
+        self.assertEqual(self.read(self.log), b'')
+        self.assertEqual(manager.history.get(VIDEO).timestamps.tolist(), [100, 200])
+
+    def test_torn_log_is_not_appended_to_without_the_lease(self):
+        self.add(100)
+        with open(self.log, 'ab') as f:
+            f.write(encode_log_records([(VIDEO, entry(200))])[:-5])
+        with mock.patch.object(app.DataManager, '_acquire_lease', return_value=False):
+            self.manager = self.new_manager()
+        self.assertTrue(self.manager.log_torn)
+
+        # The next save rewrites the base file instead of gluing a record to the partial one
+        self.add(300)
+        self.assertEqual(self.read(self.log), b'')
+        self.assertEqual(self.stored_timestamps(), [100, 300])
+
+    def test_legacy_file_is_migrated(self):
+        with open(app.DATA_FILE, 'w') as f:
+            f.write(f'{{"{VIDEO}": [{{"timestamp": 100, "total_views": 5}}]}}')
+
+        self.new_manager()
+
+        self.assertEqual(History.decode(self.read(self.base)).get(VIDEO).timestamps.tolist(), [100])
+
+    def assertRollupsMatch(self, snapshot):
+        expected = app.build_rollups(app.carry_forward(self.manager.history))
+        for name, rollup in expected.items():
+            self.assertEqual(snapshot.rollups[name].timestamps, rollup.timestamps)
+            self.assertEqual(snapshot.rollups[name].series[VIDEO].columns, rollup.series[VIDEO].columns)
+
+    def test_readers_extend_their_rollups_from_the_log(self):
+        self.add(100)
+        self.add(3700)
+        reader = app.DataManager()
+        reader.get_snapshot()
+
+        with mock.patch.object(reader, '_read_history', wraps=reader._read_history) as read_history:
+            self.add(4000)
+            self.assertRollupsMatch(reader.get_snapshot())
+            read_history.assert_not_called()  # Only the new log records were replayed
+
+            self.add(7500)  # The third record since the last compaction: the base file is rewritten
+            self.assertRollupsMatch(reader.get_snapshot())
+            read_history.assert_called_once()
+        self.assertEqual(reader.get_snapshot().rollups['hourly'].timestamps.tolist(), [100, 4000, 7500])
+
+
+if __name__ == '__main__':
+    unittest.main()
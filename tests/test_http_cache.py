@@ -0,0 +1,138 @@
+"""CachingAdapter against an in-process origin server: freshness, revalidation and the LRU bound.
+
+Run with `python -m unittest discover tests` (or pytest).
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_cache import CachingAdapter  # noqa: E402
+
+
+class FakeOrigin:
+    """Pages with fixed bodies and headers, answering If-None-Match with 304, and a log of the requests"""
+
+    def __init__(self):
+        self.pages = {}  # path -> (body, headers)
+        self.log = []  # (path, If-None-Match, status)
+
+    def handler(self):
+        origin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body, headers = origin.pages[self.path]
+                etag = headers.get('ETag')
+                status = 304 if etag is not None and self.headers.get('If-None-Match') == etag else 200
+                origin.log.append((self.path, self.headers.get('If-None-Match'), status))
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if status == 304:
+                    body = b''
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class CachingAdapterTest(unittest.TestCase):
+    def setUp(self):
+        self.origin = FakeOrigin()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.origin.handler())
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.directory = tempfile.mkdtemp()
+        self.session = self.new_session()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def new_session(self, max_bytes=1024 * 1024):
+        session = requests.Session()
+        self.adapter = CachingAdapter(self.directory, max_bytes=max_bytes)
+        session.mount('http://', self.adapter)
+        return session
+
+    def get(self, path, **kwargs):
+        response = self.session.get(self.base_url + path, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_fresh_response_is_reused_without_a_request(self):
+        self.origin.pages['/page'] = (b'fresh', {'Cache-Control': 'max-age=60'})
+        self.get('/page')
+        response = self.get('/page')
+
+        self.assertEqual(response.content, b'fresh')
+        self.assertTrue(response.from_cache)
+        self.assertEqual(len(self.origin.log), 1)
+        self.assertEqual(self.adapter.stats, {'fresh': 1, 'revalidated': 0, 'miss': 1})
+
+    def test_stale_response_is_revalidated(self):
+        self.origin.pages['/page'] = (b'body', {'ETag': '"v1"', 'Cache-Control': 'max-age=0'})
+        self.get('/page')
+        response = self.get('/page')
+
+        self.assertEqual(response.content, b'body')
+        self.assertTrue(response.from_cache)
+        self.assertEqual(self.origin.log[-1], ('/page', '"v1"', 304))
+
+        # A changed page replaces the stored one
+        self.origin.pages['/page'] = (b'new body', {'ETag': '"v2"'})
+        self.assertEqual(self.get('/page').content, b'new body')
+        self.assertEqual(self.get('/page').content, b'new body')
+        self.assertEqual(self.origin.log[-1], ('/page', '"v2"', 304))
+
+    def test_no_cache_request_revalidates_fresh_response(self):
+        self.origin.pages['/page'] = (b'body', {'ETag': '"v1"', 'Cache-Control': 'max-age=60'})
+        self.get('/page')
+        self.get('/page', headers={'Cache-Control': 'no-cache'})
+        self.get('/page', headers={'Pragma': 'no-cache'})
+
+        self.assertEqual([status for _, _, status in self.origin.log], [200, 304, 304])
+
+    def test_uncacheable_responses_are_not_stored(self):
+        self.origin.pages['/no-store'] = (b'body', {'ETag': '"v1"', 'Cache-Control': 'no-store'})
+        self.origin.pages['/no-validator'] = (b'body', {})
+        for path in ('/no-store', '/no-validator'):
+            self.get(path)
+            self.get(path)
+        self.get('/no-store', headers={'Authorization': 'Bearer token'})
+
+        self.assertEqual([status for _, _, status in self.origin.log], [200] * 5)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for name in ('a', 'b', 'c'):
+            self.origin.pages[f'/{name}'] = (name.encode('utf-8') * 100, {'Cache-Control': 'max-age=60'})
+        self.session = self.new_session(max_bytes=600)  # Room for two entries
+        self.get('/a')
+        self.get('/b')
+        self.get('/a')  # Now b is the least recently used
+        self.get('/c')
+        self.assertEqual(len(self.adapter.entries), 2)
+
+        # A new process picks up the entries left in the directory
+        self.session = self.new_session(max_bytes=600)
+        for path in ('/a', '/c', '/b'):
+            self.get(path)
+        self.assertEqual([path for path, _, _ in self.origin.log], ['/a', '/b', '/c', '/b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
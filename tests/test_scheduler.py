@@ -0,0 +1,89 @@
+"""RefreshScheduler: growth-based intervals, the lazily cleaned due heap, and its saved state.
+
+Run with `python -m unittest discover tests` (or pytest).
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import RefreshScheduler  # noqa: E402
+
+PAIR = ('video', 'tiktok')
+OTHER = ('video', 'tumblr')
+
+
+def new_scheduler():
+    return RefreshScheduler(default_interval=3600, min_interval=600, max_interval=86400, change_target=0.01)
+
+
+class RefreshSchedulerTest(unittest.TestCase):
+    def test_new_pairs_are_due_at_once(self):
+        scheduler = new_scheduler()
+        self.assertIsNone(scheduler.next_due())
+        scheduler.add(PAIR)
+        scheduler.add(OTHER, fetched_at=1000, metrics=[100, 10, 1])
+
+        self.assertEqual(scheduler.next_due(), 0)
+        self.assertEqual(scheduler.due(0), [PAIR])
+        self.assertEqual(scheduler.due(1000 + 3600), [PAIR, OTHER])  # Earliest first
+
+    def test_interval_follows_growth_rate(self):
+        scheduler = new_scheduler()
+        scheduler.add(PAIR)
+        scheduler.record(PAIR, 0, [10000])
+        self.assertEqual(scheduler.interval(PAIR), 3600)  # No rate yet
+
+        # 1% of 10100 at 1 per second: 101 seconds, raised to min_interval
+        scheduler.record(PAIR, 100, [10100])
+        self.assertEqual(scheduler.interval(PAIR), 600)
+        self.assertEqual(scheduler.next_due(), 700)
+
+        # Growth stops: the smoothed rate halves, and only reaches max_interval at zero
+        scheduler.record(PAIR, 800, [10100])
+        self.assertEqual(scheduler.pairs[PAIR]['rate'], 0.5)
+        self.assertEqual(scheduler.interval(PAIR), 600)  # 202 seconds, still below min_interval
+        scheduler.pairs[PAIR]['rate'] = 0
+        self.assertEqual(scheduler.interval(PAIR), 86400)
+
+    def test_outdated_heap_entries_are_skipped(self):
+        scheduler = new_scheduler()
+        scheduler.add(PAIR)
+        scheduler.add(OTHER)
+        scheduler.record(PAIR, 100, [1])
+        scheduler.record_failure(OTHER, 50)
+
+        # Both pairs left their due-at-0 entries behind in the heap
+        self.assertEqual(len(scheduler.heap), 4)
+        self.assertEqual(scheduler.next_due(), 650)
+        self.assertEqual(len(scheduler.heap), 2)
+        self.assertEqual(scheduler.due(650), [OTHER])
+
+    def test_failure_keeps_the_last_good_state(self):
+        scheduler = new_scheduler()
+        scheduler.add(PAIR)
+        scheduler.record(PAIR, 0, [10000])
+        scheduler.record(PAIR, 100, [10100])
+        scheduler.record_failure(PAIR, 200)
+
+        self.assertEqual(scheduler.pairs[PAIR]['metrics'], [10100])
+        self.assertEqual(scheduler.pairs[PAIR]['rate'], 1)
+        self.assertEqual(scheduler.next_due(), 800)
+
+    def test_state_survives_encode_and_load(self):
+        scheduler = new_scheduler()
+        scheduler.add(PAIR)
+        scheduler.add(OTHER)
+        scheduler.record(PAIR, 0, [10000])
+        scheduler.record(PAIR, 100, [10100])
+
+        loaded = new_scheduler()
+        loaded.load(scheduler.encode(), {PAIR})  # OTHER is no longer tracked
+
+        self.assertEqual(loaded.pairs, {PAIR: scheduler.pairs[PAIR]})
+        self.assertEqual(loaded.next_due(), scheduler.pairs[PAIR]['due_at'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+"""The columnar history file format, carry-forward of missing platforms, and rollup tiers.
+
+Run with `python -m unittest discover tests` (or pytest).
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timeseries import (  # noqa: E402
+    CARRIED_COLUMN, COLUMNS, MISSING, History, Rollup, carry_forward, carry_forward_entry
+)
+
+
+def point(timestamp, **platforms):
+    """An entry with views/likes/comments of value, value // 10, value // 100 for each platform given"""
+    entry = {'timestamp': timestamp}
+    for platform, value in platforms.items():
+        entry.update({f'views_{platform}': value, f'likes_{platform}': value // 10, f'comments_{platform}': value // 100})
+    entry['total_views'] = sum(platforms.values())
+    entry['total_likes'] = sum(value // 10 for value in platforms.values())
+    entry['total_comments'] = sum(value // 100 for value in platforms.values())
+    return entry
+
+
+def sample_history():
+    history = History(['a', 'b'])
+    history.append('a', point(100, youtube=1000, tiktok=5000))
+    history.append('b', point(150, youtube=200))
+    history.append('a', point(200, youtube=1100))  # TikTok failed
+    history.append('a', point(300, tiktok=6000))  # YouTube failed
+    history.append('b', point(400, tiktok=50))  # YouTube failed, TikTok seen for the first time
+    return history
+
+
+class HistoryFileTest(unittest.TestCase):
+    def test_encode_decode_round_trip(self):
+        history = sample_history()
+        decoded = History.decode(history.encode(), ['a', 'b', 'c'])
+
+        self.assertEqual(list(decoded.series), ['a', 'b', 'c'])  # Videos added since are appended
+        self.assertEqual(decoded.to_legacy(), {**history.to_legacy(), 'c': []})
+        self.assertEqual(decoded.get('a').columns['views_tiktok'][1], MISSING)
+        self.assertEqual(decoded.file_header, history.header())
+
+    def test_partial_trailing_record_is_ignored(self):
+        history = sample_history()
+        raw = history.encode()
+        record_size = 8 * (2 + len(COLUMNS))
+
+        decoded = History.decode(raw[:-record_size // 2])
+
+        self.assertEqual(len(decoded), len(history) - 1)
+        self.assertEqual(decoded.get('b').timestamps.tolist(), [150])
+
+    def test_records_appended_after_encode_are_decoded(self):
+        history = sample_history()
+        raw = history.encode() + history.encode_records([('b', point(500, youtube=300))])
+
+        self.assertEqual(History.decode(raw).get('b').timestamps.tolist(), [150, 400, 500])
+
+    def test_other_files_are_rejected(self):
+        with self.assertRaises(ValueError):
+            History.decode(b'{"a": []}')
+
+    def test_legacy_layout(self):
+        legacy = {'a': [point(200, youtube=2), point(100, youtube=1)]}
+        history = History.from_legacy(legacy, ['b'])
+
+        self.assertEqual(list(history.series), ['b', 'a'])
+        self.assertEqual(history.get('a').timestamps.tolist(), [100, 200])
+
+
+class CarryForwardTest(unittest.TestCase):
+    def test_missing_platforms_repeat_the_last_observed_values(self):
+        filled = carry_forward(sample_history())
+        a, b = filled.get('a'), filled.get('b')
+
+        self.assertEqual(a.columns['views_tiktok'].tolist(), [5000, 5000, 6000])
+        self.assertEqual(a.columns['views_youtube'].tolist(), [1000, 1100, 1100])
+        self.assertEqual(a.columns['total_views'].tolist(), [6000, 6100, 7100])
+        self.assertEqual(a.columns[CARRIED_COLUMN].tolist(), [0, 0b10, 0b1])
+        # Nothing is carried before a platform's first observation
+        self.assertEqual(b.columns['views_youtube'].tolist(), [200, 200])
+        self.assertEqual(b.columns['views_tiktok'].tolist(), [MISSING, 50])
+        self.assertEqual(b.columns['total_views'].tolist(), [200, 250])
+
+    def test_stored_history_is_not_changed(self):
+        history = sample_history()
+        carry_forward(history)
+        self.assertEqual(history.get('a').columns['views_tiktok'][1], MISSING)
+
+    def test_single_points_match_the_whole_history(self):
+        history = sample_history()
+        filled = carry_forward(history)
+        for video_id, series in history.items():
+            previous = None
+            for index in range(len(series)):
+                previous = carry_forward_entry(series.point(index), previous)
+                expected = filled.get(video_id).point(index)
+                self.assertEqual(previous, expected)
+
+
+class RollupTest(unittest.TestCase):
+    def test_buckets_hold_the_last_point_of_each_video(self):
+        rollup = Rollup.from_history(sample_history(), 200)
+
+        self.assertEqual(rollup.buckets.tolist(), [0, 1, 2])
+        self.assertEqual(rollup.timestamps.tolist(), [150, 300, 400])
+        self.assertEqual(rollup.series['a'].timestamps.tolist(), [100, 300, MISSING])
+        self.assertEqual(rollup.series['b'].columns['views_tiktok'].tolist(), [MISSING, MISSING, 50])
+        self.assertEqual(rollup.index_range(since=200, until=350), (1, 2))
+
+    def test_appending_matches_building_from_history(self):
+        history = sample_history()
+        rollup = Rollup(200, (), history.columns)
+        for video_id, series in history.items():
+            for index in range(len(series)):
+                rollup.append(video_id, series.point(index))
+        built = Rollup.from_history(history, 200)
+
+        self.assertEqual(rollup.buckets, built.buckets)
+        self.assertEqual(rollup.timestamps, built.timestamps)
+        for video_id in built.series:
+            self.assertEqual(rollup.series[video_id].timestamps, built.series[video_id].timestamps)
+            self.assertEqual(rollup.series[video_id].columns, built.series[video_id].columns)
+
+    def test_copy_is_independent(self):
+        rollup = Rollup.from_history(sample_history(), 200)
+        copied = rollup.copy()
+        rollup.append('a', point(1000, youtube=2000))
+
+        self.assertEqual(len(copied), 3)
+        self.assertEqual(len(rollup), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
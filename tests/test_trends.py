@@ -0,0 +1,120 @@
+"""LTTB downsampling and the /api/trends windowing on top of it, on a generated history.
+
+Run with `python -m unittest discover tests` (or pytest).
+"""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import (  # noqa: E402
+    PLAYER_VIDEOS, TREND_METRICS, VIDEOS, Snapshot, build_trend_window, parse_trend_query
+)
+from downsample import lttb_indices  # noqa: E402
+from timeseries import METRICS, PLATFORMS, TOTAL_COLUMNS, History  # noqa: E402
+
+START = 1_700_000_000
+
+
+def generated_history(refreshes=500, seed=1):
+    """Every video refreshed about every 20 minutes, each refresh sometimes missing a video or a platform"""
+    rng = random.Random(seed)
+    history = History(VIDEOS)
+    totals = {video_id: [0] * len(METRICS) for video_id in VIDEOS}
+    timestamp = START
+    for _ in range(refreshes):
+        timestamp += rng.randrange(900, 1500)
+        for video_id in VIDEOS:
+            if rng.random() < 0.1:
+                continue
+            entry = {'timestamp': timestamp}
+            for platform in PLATFORMS:
+                if rng.random() < 0.1:
+                    continue
+                for index, metric in enumerate(METRICS):
+                    totals[video_id][index] += rng.randrange(100)
+                    entry[f'{metric}_{platform}'] = totals[video_id][index]
+            for index, name in enumerate(TOTAL_COLUMNS):
+                entry[name] = sum(entry.get(f'{METRICS[index]}_{platform}', 0) for platform in PLATFORMS)
+            history.append(video_id, entry)
+    return history
+
+
+class LttbTest(unittest.TestCase):
+    def test_short_inputs_are_kept_whole(self):
+        self.assertEqual(lttb_indices([1, 2, 3], [1, 2, 3], 5), [0, 1, 2])
+        self.assertEqual(lttb_indices([1, 2, 3, 4], [1, 2, 3, 4], 2), [0, 3])
+
+    def test_keeps_endpoints_and_peaks(self):
+        xs = list(range(100))
+        ys = [0] * 100
+        ys[37] = 1000  # A viral jump
+        indices = lttb_indices(xs, ys, 10)
+
+        self.assertEqual(len(indices), 10)
+        self.assertEqual((indices[0], indices[-1]), (0, 99))
+        self.assertEqual(indices, sorted(set(indices)))
+        self.assertIn(37, indices)
+
+
+class TrendQueryTest(unittest.TestCase):
+    def test_parse(self):
+        query = parse_trend_query({'since': '100', 'after': '150', 'max_points': '20', 'metrics': 'likes,views'})
+        self.assertEqual(query['since'], 151)  # after is exclusive and the later bound wins
+        self.assertEqual(query['metrics'], ['views', 'likes'])  # In the order of TREND_METRICS
+        self.assertEqual(parse_trend_query({})['metrics'], TREND_METRICS)
+
+        for args in ({'since': 'yesterday'}, {'max_points': '1'}, {'metrics': 'shares'}, {'platforms': 'myspace'}):
+            with self.assertRaises(ValueError):
+                parse_trend_query(args)
+
+
+class TrendWindowTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.snapshot = Snapshot(generated_history(), 1)
+        cls.timestamps = cls.snapshot.trend_series.timestamps
+
+    def test_window_is_inclusive(self):
+        since, until = self.timestamps[100], self.timestamps[199]
+        trends = build_trend_window(self.snapshot, since=since, until=until)
+
+        for player in PLAYER_VIDEOS:
+            points = trends['players'][player]['data']
+            self.assertEqual([point['timestamp'] for point in points], self.timestamps[100:200])
+        for video in trends['videos'].values():
+            self.assertTrue(all(since <= point['timestamp'] <= until for point in video['data']))
+
+    def test_downsampled_lines_stay_aligned(self):
+        trends = build_trend_window(self.snapshot, since=self.timestamps[50], max_points=40)
+
+        axes = {tuple(point['timestamp'] for point in player['data']) for player in trends['players'].values()}
+        self.assertEqual(len(axes), 1)
+        axis = axes.pop()
+        self.assertLessEqual(len(axis), 40)
+        for video in trends['videos'].values():
+            self.assertLessEqual(len(video['data']), len(axis))
+            self.assertTrue(set(point['timestamp'] for point in video['data']) <= set(self.timestamps))
+
+    def test_long_windows_use_a_rollup_tier(self):
+        # About a week of refreshes: 170 hourly buckets but only 7 daily ones
+        trends = build_trend_window(self.snapshot, max_points=50)
+        axis = [point['timestamp'] for point in trends['players']['Trapp']['data']]
+        hourly = self.snapshot.rollups['hourly']
+
+        self.assertEqual(len(axis), 50)
+        self.assertTrue(set(axis) <= set(hourly.timestamps))
+
+    def test_fields_are_filtered(self):
+        trends = build_trend_window(self.snapshot, max_points=10, metrics=['views'], platforms=['tiktok'])
+        player_point = trends['players']['Rekha']['data'][0]
+        video_point = next(iter(trends['videos'].values()))['data'][0]
+
+        self.assertEqual(set(player_point), {'timestamp', 'views'})
+        self.assertLessEqual(set(video_point), {'timestamp', 'views', 'views_tiktok', 'carried'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,385 @@
+"""Columnar storage for the engagement history.
+
+Each video keeps an array of timestamps and one int64 array per metric column
+instead of a list of dicts. On disk the history is a compacted base file (a
+small JSON header followed by fixed-width little-endian int64 records) plus an
+append-only log with one JSON line per video snapshot recorded since the last
+compaction.
+"""
+import array
+import json
+import logging
+import operator
+import sys
+from bisect import bisect_left, bisect_right
+
+logger = logging.getLogger(__name__)
+
+PLATFORMS = ['youtube', 'tiktok', 'tumblr', 'instagram', 'threads', 'bluesky']
+METRICS = ['views', 'likes', 'comments']
+TOTAL_COLUMNS = ['total_views', 'total_likes', 'total_comments']
+PLATFORM_COLUMNS = [f'{metric}_{platform}' for platform in PLATFORMS for metric in METRICS]
+COLUMNS = TOTAL_COLUMNS + PLATFORM_COLUMNS
+# Only in carried-forward histories, never stored: bitmask of the PLATFORMS whose values a point repeats
+CARRIED_COLUMN = 'carried'
+
+# Stored for platform values that were not fetched for a point
+MISSING = -1
+
+MAGIC = b'FGTS1\n'
+
+
+class VideoSeries:
+    """Timestamps plus one int64 column per metric for a single video"""
+
+    def __init__(self, columns=COLUMNS):
+        self.timestamps = array.array('q')
+        self.columns = {name: array.array('q') for name in columns}
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def latest_timestamp(self):
+        return self.timestamps[-1] if self.timestamps else None
+
+    def append(self, entry):
+        self.timestamps.append(entry['timestamp'])
+        for name, column in self.columns.items():
+            column.append(entry.get(name, MISSING))
+
+    def point(self, index):
+        """Return one point in the legacy dict layout, leaving out missing values"""
+        point = {'timestamp': self.timestamps[index]}
+        for name, column in self.columns.items():
+            value = column[index]
+            if value != MISSING:
+                point[name] = value
+        return point
+
+    def points(self):
+        return [self.point(index) for index in range(len(self.timestamps))]
+
+
+class History:
+    """Columnar engagement history for every video"""
+
+    def __init__(self, videos=(), columns=COLUMNS):
+        self.columns = list(columns)
+        self.series = {video_id: VideoSeries(self.columns) for video_id in videos}
+        # Header bytes of the file this history was decoded from, if any
+        self.file_header = None
+
+    def __len__(self):
+        return sum(len(series) for series in self.series.values())
+
+    def get(self, video_id):
+        if video_id not in self.series:
+            self.series[video_id] = VideoSeries(self.columns)
+        return self.series[video_id]
+
+    def append(self, video_id, entry):
+        self.get(video_id).append(entry)
+
+    def items(self):
+        return self.series.items()
+
+    @classmethod
+    def from_legacy(cls, data, videos=()):
+        """Build a history from the old {video: [point, ...]} JSON layout"""
+        history = cls(list(dict.fromkeys([*videos, *data])))
+        for video_id, video_data in data.items():
+            series = history.get(video_id)
+            for point in sorted(video_data, key=lambda p: p['timestamp']):
+                series.append(point)
+        return history
+
+    def to_legacy(self):
+        return {video_id: series.points() for video_id, series in self.series.items()}
+
+    def header(self):
+        header = json.dumps({'videos': list(self.series), 'columns': self.columns})
+        return MAGIC + header.encode('utf-8') + b'\n'
+
+    def encode_records(self, entries):
+        """Encode (video_id, entry) pairs as fixed-width records for the data file"""
+        videos = list(self.series)
+        records = array.array('q')
+        for video_id, entry in entries:
+            records.append(videos.index(video_id))
+            records.append(entry['timestamp'])
+            records.extend(entry.get(name, MISSING) for name in self.columns)
+        if sys.byteorder != 'little':
+            records.byteswap()
+        return records.tobytes()
+
+    def encode(self):
+        """Encode the whole history: header followed by every record in time order"""
+        entries = []
+        for video_id, series in self.series.items():
+            for index in range(len(series)):
+                entries.append((series.timestamps[index], video_id, series.point(index)))
+        entries.sort(key=operator.itemgetter(0))
+        return self.header() + self.encode_records((video_id, entry) for _, video_id, entry in entries)
+
+    @classmethod
+    def decode(cls, raw, videos=()):
+        """Decode a data file produced by encode/encode_records"""
+        if not raw.startswith(MAGIC):
+            raise ValueError("Not a columnar history file")
+        header_end = raw.index(b'\n', len(MAGIC))
+        header = json.loads(raw[len(MAGIC):header_end])
+        file_videos = header['videos']
+        history = cls(list(dict.fromkeys([*file_videos, *videos])), header['columns'])
+        history.file_header = raw[:header_end + 1]
+
+        width = 2 + len(history.columns)
+        body = raw[header_end + 1:]
+        # Ignore a partially written trailing record
+        usable = len(body) - len(body) % (width * 8)
+        records = array.array('q')
+        records.frombytes(body[:usable])
+        if sys.byteorder != 'little':
+            records.byteswap()
+
+        rows = {}
+        for row, video_index in enumerate(records[0::width]):
+            rows.setdefault(video_index, []).append(row)
+
+        timestamps = records[1::width]
+        columns = {name: records[2 + offset::width] for offset, name in enumerate(history.columns)}
+        for video_index, video_rows in rows.items():
+            series = history.get(file_videos[video_index])
+            pick = operator.itemgetter(*video_rows) if len(video_rows) > 1 else (lambda values: (values[video_rows[0]],))
+            series.timestamps = array.array('q', pick(timestamps))
+            for name, column in columns.items():
+                series.columns[name] = array.array('q', pick(column))
+
+        return history
+
+    def replay_log(self, raw, appended=None):
+        """Apply log lines on top of the history.
+        
+        Returns (applied, torn): the number of records applied and whether the
+        log ended in a partially written line. Records that are not newer than
+        the video's latest point are skipped, so replaying a log that was
+        already compacted into the base file is harmless. A corrupt record in
+        the middle of the log, such as a torn tail that a later append landed
+        after, is logged and skipped rather than failing the whole replay.
+        The (video_id, entry) pairs applied are added to the appended list, if
+        one is given.
+        """
+        applied = 0
+        torn = False
+        lines = raw.split(b'\n')
+        for line_number, line in enumerate(lines):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                video_id = record.pop('video')
+                int(record['timestamp'])
+            except (ValueError, KeyError, TypeError, AttributeError):
+                # Only the last line can be cut short by a crash mid-append
+                if line_number == len(lines) - 1:
+                    torn = True
+                    break
+                logger.warning(f"Skipping corrupt log record on line {line_number + 1}")
+                continue
+            series = self.get(video_id)
+            latest = series.latest_timestamp()
+            if latest is None or record['timestamp'] > latest:
+                series.append(record)
+                applied += 1
+                if appended is not None:
+                    appended.append((video_id, record))
+        if lines and lines[-1].strip() and not torn:
+            # A complete record is always followed by a newline
+            torn = True
+        return applied, torn
+
+
+class Rollup:
+    """The last point of every video in each fixed-width time bucket.
+    
+    All videos share one bucket axis. A video's slot in a bucket holds its
+    last point there (timestamp MISSING if it has none), and the bucket's
+    timestamp is the latest point time in it over all videos. Appending a
+    point touches a single bucket, so the rollup can be kept up to date as
+    refreshes arrive.
+    """
+    
+    def __init__(self, width, videos=(), columns=COLUMNS):
+        self.width = width
+        self.columns = list(columns)
+        self.buckets = array.array('q')  # Bucket numbers, timestamp // width
+        self.timestamps = array.array('q')
+        self.series = {}
+        for video_id in videos:
+            self._add_video(video_id)
+    
+    def __len__(self):
+        return len(self.buckets)
+    
+    def _add_video(self, video_id):
+        series = VideoSeries(self.columns)
+        empty = array.array('q', [MISSING]) * len(self.buckets)
+        series.timestamps = array.array('q', empty)
+        for name in self.columns:
+            series.columns[name] = array.array('q', empty)
+        self.series[video_id] = series
+        return series
+    
+    def _slot(self, bucket):
+        """Index of a bucket, inserting an empty one if it does not exist yet"""
+        index = bisect_left(self.buckets, bucket)
+        if index == len(self.buckets) or self.buckets[index] != bucket:
+            self.buckets.insert(index, bucket)
+            self.timestamps.insert(index, MISSING)
+            for series in self.series.values():
+                series.timestamps.insert(index, MISSING)
+                for column in series.columns.values():
+                    column.insert(index, MISSING)
+        return index
+    
+    def append(self, video_id, entry):
+        timestamp = entry['timestamp']
+        series = self.series.get(video_id) or self._add_video(video_id)
+        index = self._slot(timestamp // self.width)
+        if timestamp < series.timestamps[index]:
+            return
+        series.timestamps[index] = timestamp
+        for name, column in series.columns.items():
+            column[index] = entry.get(name, MISSING)
+        if timestamp > self.timestamps[index]:
+            self.timestamps[index] = timestamp
+    
+    def index_range(self, since=None, until=None):
+        """[start, end) indices of the buckets whose timestamp is within since..until"""
+        start = bisect_left(self.timestamps, since) if since is not None else 0
+        end = bisect_right(self.timestamps, until) if until is not None else len(self.timestamps)
+        return start, end
+    
+    def copy(self):
+        rollup = Rollup(self.width, (), self.columns)
+        rollup.buckets = array.array('q', self.buckets)
+        rollup.timestamps = array.array('q', self.timestamps)
+        for video_id, series in self.series.items():
+            copied = rollup.series[video_id] = VideoSeries(self.columns)
+            copied.timestamps = array.array('q', series.timestamps)
+            copied.columns = {name: array.array('q', column) for name, column in series.columns.items()}
+        return rollup
+    
+    @classmethod
+    def from_history(cls, history, width):
+        """Build a rollup in one pass over each video's timestamps"""
+        last_indices = {}
+        buckets = set()
+        for video_id, series in history.items():
+            timestamps = series.timestamps
+            # Timestamps are sorted, so a bucket's last point is the one before the bucket changes
+            last_indices[video_id] = [
+                index for index in range(len(timestamps))
+                if index == len(timestamps) - 1 or timestamps[index] // width != timestamps[index + 1] // width
+            ]
+            buckets.update(timestamps[index] // width for index in last_indices[video_id])
+        
+        rollup = cls(width, (), history.columns)
+        rollup.buckets = array.array('q', sorted(buckets))
+        rollup.timestamps = array.array('q', [MISSING]) * len(rollup.buckets)
+        slots = {bucket: slot for slot, bucket in enumerate(rollup.buckets)}
+        for video_id, series in history.items():
+            target = rollup._add_video(video_id)
+            for index in last_indices[video_id]:
+                timestamp = series.timestamps[index]
+                slot = slots[timestamp // width]
+                target.timestamps[slot] = timestamp
+                if timestamp > rollup.timestamps[slot]:
+                    rollup.timestamps[slot] = timestamp
+            for name, column in series.columns.items():
+                target_column = target.columns[name]
+                for index in last_indices[video_id]:
+                    target_column[slots[series.timestamps[index] // width]] = column[index]
+        return rollup
+
+
+def carried_platforms(mask):
+    """The platforms set in a CARRIED_COLUMN bitmask"""
+    return [platform for bit, platform in enumerate(PLATFORMS) if mask >> bit & 1]
+
+
+def carry_forward(history):
+    """A view of history in which a platform missing from a point repeats the video's last observed value.
+
+    Failed fetches are stored as MISSING, so without this a video's scores
+    would drop whenever one platform could not be fetched. Totals of points
+    with carried values are recomputed from the filled platform values, and
+    CARRIED_COLUMN marks which platforms each point carried. Values before a
+    platform's first observation stay missing. Columns without gaps are shared
+    with history, not copied.
+    """
+    filled = History((), [*history.columns, CARRIED_COLUMN])
+    for video_id, series in history.items():
+        target = filled.get(video_id)
+        target.timestamps = series.timestamps
+        target.columns = dict(series.columns)
+        carried = array.array('q', bytes(8 * len(series)))
+        target.columns[CARRIED_COLUMN] = carried
+
+        for bit, platform in enumerate(PLATFORMS):
+            names = [f'{metric}_{platform}' for metric in METRICS]
+            if any(name not in series.columns for name in names):
+                continue
+            views = series.columns[names[0]]
+            first = next((index for index, value in enumerate(views) if value != MISSING), None)
+            if first is None or MISSING not in views[first:]:
+                continue
+            columns = [array.array('q', series.columns[name]) for name in names]
+            last = first
+            for index in range(first + 1, len(views)):
+                if views[index] == MISSING:
+                    for column in columns:
+                        column[index] = column[last]
+                    carried[index] |= 1 << bit
+                else:
+                    last = index
+            target.columns.update(zip(names, columns))
+
+        if any(carried):
+            for metric, total_name in zip(METRICS, TOTAL_COLUMNS):
+                platform_columns = [
+                    target.columns[name] for name in (f'{metric}_{platform}' for platform in PLATFORMS)
+                    if name in target.columns
+                ]
+                total = array.array('q', series.columns[total_name])
+                for index, mask in enumerate(carried):
+                    if mask:
+                        total[index] = sum(column[index] for column in platform_columns if column[index] != MISSING)
+                target.columns[total_name] = total
+    return filled
+
+
+def carry_forward_entry(entry, previous):
+    """The point carry_forward makes of entry, given previous, the video's last carry_forward point (None if none)"""
+    filled = dict(entry)
+    carried = 0
+    for bit, platform in enumerate(PLATFORMS):
+        names = [f'{metric}_{platform}' for metric in METRICS]
+        if entry.get(names[0], MISSING) != MISSING or previous is None or previous.get(names[0], MISSING) == MISSING:
+            continue
+        for name in names:
+            filled[name] = previous.get(name, MISSING)
+        carried |= 1 << bit
+    if carried:
+        for metric, total_name in zip(METRICS, TOTAL_COLUMNS):
+            values = (filled.get(f'{metric}_{platform}', MISSING) for platform in PLATFORMS)
+            filled[total_name] = sum(value for value in values if value != MISSING)
+    filled[CARRIED_COLUMN] = carried
+    return filled
+
+
+def encode_log_records(entries):
+    """Encode (video_id, entry) pairs as newline-terminated JSON log lines"""
+    return b''.join(
+        json.dumps({'video': video_id, **entry}, separators=(',', ':')).encode('utf-8') + b'\n'
+        for video_id, entry in entries
+    )